@@ -1,47 +1,297 @@
+import asyncio
 import string
+import sys
 import time
 import random
-from concurrent.futures import ThreadPoolExecutor, wait
-from queue import Queue
-from threading import Thread
-from typing import Any
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from queue import Queue, Empty
+from threading import Lock, Thread
+from typing import Any, Dict, List, Tuple, Union
+
+_STOP = object()  # Sentinel to stop `run_forever`
+
+
+def _drop(future: Future):
+    """ Cancel `future`, and wake up `concurrent.futures.wait` too, which `cancel` alone doesn't """
+    future.cancel()
+    future.set_running_or_notify_cancel()
 
 
 class Websocket:
     """ Execution class """
 
-    def __init__(self):
+    def __init__(self, max_batch: int = 64, linger: float = 0.0, latency: float = 1.0,
+                 verbose: bool = True):
+        """
+        :param max_batch: Max number of messages sent in a single frame
+        :param linger: Seconds to wait for more messages before sending a frame which is not full
+        :param latency: Max seconds to send a frame (simulated)
+        """
+        self.max_batch = max_batch
+        self.linger = linger
+        self.latency = latency
+        self.verbose = verbose
         self.run = True
         self.queue = Queue()  # List of pending requests
+        self.lock = Lock()  # Nothing is enqueued after `_STOP`
+        self.sent = 0
+        self.batch_sizes = Counter()  # Histogram of the number of messages per frame
         self.run_forever_thr = Thread(target=self.run_forever)
         self.run_forever_thr.start()
 
     def run_forever(self):
         """ Scheduler can implement other scheduling policies """
-        print('Start run_forever')
-        while self.run:
-            msg = self.queue.get()
-            print(f'Send : {msg}')
-            time.sleep(random.random())
+        if self.verbose:
+            print('Start run_forever')
+
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            # Drop the messages cancelled by the callers. The rest can't be cancelled any more.
+            batch = [(msg, future) for msg, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                self.send_frame([msg for msg, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+        # Drop the messages enqueued while stopping
+        while not self.queue.empty():
+            _drop(self.queue.get_nowait()[1])
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, Future]], bool]:
+        """ Block for a message, and drain the waiting ones into a batch """
+        batch = []
+        item = self.queue.get()
+        deadline = time.monotonic() + self.linger
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                return batch, False
+
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return batch, False
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except Empty:
+                    return batch, False
+
+        return batch, True
+
+    def send_frame(self, batch: List[str]):
+        if self.verbose:
+            print(f'Send : {batch}')
+        time.sleep(random.random() * self.latency)
+        self.sent += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+    def enqueue_item(self, item: str, key: str = None) -> Future:
+        """ Return a future completed when `item` is sent, or cancelled if dropped """
+        future = Future()
+        with self.lock:
+            if self.run:
+                # Unbounded, so it doesn't block under the lock
+                self.queue.put((item, future))
+                return future
+        _drop(future)
+        return future
+
+    def stop(self, join: bool = True):
+        """ Stop accepting messages, and send the ones already enqueued before stopping """
+        with self.lock:
+            if not self.run:
+                return
+            self.run = False
+            self.queue.put(_STOP)
+        if join:
+            self.run_forever_thr.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'sent': self.sent, 'frames': sum(self.batch_sizes.values()),
+                'batch_sizes': dict(sorted(self.batch_sizes.items()))}
+
+
+class ShardedWebsocket:
+    """
+    Execution class with several schedulers.
+    Messages are routed to a scheduler by hashing the key(client name), so that
+    messages of the same client stay in order while different clients are sent in parallel.
+    """
 
-    def enqueue_item(self, item: str):
-        if self.run:
-            self.queue.put(item)
+    def __init__(self, shards: int = 4, **kwargs):
+        self.shards = [Websocket(**kwargs) for _ in range(shards)]
 
-    def stop(self):
-        self.run = False
+    def enqueue_item(self, item: str, key: str = None) -> Future:
+        return self.shards[hash(key) % len(self.shards)].enqueue_item(item)
+
+    def stop(self, join: bool = True):
+        for shard in self.shards:
+            shard.stop(join=False)
+        if join:
+            for shard in self.shards:
+                shard.run_forever_thr.join()
+
+    def stats(self) -> Dict[str, Any]:
+        batch_sizes = sum((shard.batch_sizes for shard in self.shards), Counter())
+        return {'sent': sum(shard.sent for shard in self.shards), 'frames': sum(batch_sizes.values()),
+                'batch_sizes': dict(sorted(batch_sizes.items()))}
 
 
 class Client:
     """ Invocation class """
 
-    def __init__(self, name: str, ws: Websocket):
+    def __init__(self, name: str, ws: Union[Websocket, ShardedWebsocket]):
         self.name = name
         self.ws = ws
 
-    def send_random_msg(self, prefix: Any):
+    def send_random_msg(self, prefix: Any) -> Future:
+        """ Return a future completed when the message is sent """
         msg = f'[{self.name}] {prefix}-{"".join(random.sample(string.ascii_letters, 6))}'
-        self.ws.enqueue_item(msg)
+        return self.ws.enqueue_item(msg, key=self.name)
+
+
+class TokenBucket:
+    """ Allow `rate` tokens per second on average, and bursts up to `capacity` tokens """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self, n: int = 1):
+        n = min(n, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class EchoServer:
+    """ In-process stand-in of the remote websocket server, which echoes frames back """
+
+    def __init__(self, latency: float = 0.001):
+        self.latency = latency
+        self.received = 0
+
+    async def send(self, frame: List[str]) -> List[str]:
+        await asyncio.sleep(self.latency)
+        self.received += len(frame)
+        return frame
+
+
+class AsyncWebsocket:
+    """
+    Execution class running on an event loop.
+    Producers wait while the mailbox is full, and frames are sent no faster than `rate` messages/s.
+    """
+
+    def __init__(self, server: EchoServer, mailbox_size: int = 1024, max_batch: int = 64,
+                 rate: float = None):
+        """
+        :param mailbox_size: Max number of pending messages
+        :param rate: Max messages sent per second. None for no limit.
+        """
+        self.server = server
+        self.max_batch = max_batch
+        self.mailbox = asyncio.Queue(maxsize=mailbox_size)
+        self.limiter = TokenBucket(rate, max_batch) if rate else None
+        self.sent = 0
+        self.batch_sizes = Counter()
+        self.closed = False
+        self.run_forever_task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    async def run_forever(self):
+        stopped = False
+        while not stopped:
+            item = await self.mailbox.get()
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.max_batch or self.mailbox.empty():
+                    break
+                item = self.mailbox.get_nowait()
+            stopped = item is _STOP
+
+            if batch:
+                await self.send_frame(batch)
+
+        self._drop_pending()
+
+    def _drop_pending(self):
+        """ Cancel the messages left in the mailbox after `run_forever` has exited """
+        while not self.mailbox.empty():
+            item = self.mailbox.get_nowait()
+            if item is not _STOP:
+                item[1].cancel()
+
+    async def send_frame(self, batch: List[Tuple[str, asyncio.Future]]):
+        if self.limiter is not None:
+            await self.limiter.acquire(len(batch))
+
+        try:
+            await self.server.send([msg for msg, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+        self.sent += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+    async def enqueue_item(self, item: str) -> asyncio.Future:
+        """
+        Wait while the mailbox is full. Return a future completed when `item` is sent,
+        or cancelled if the websocket is stopped before sending it.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self.closed:
+            future.cancel()
+            return future
+
+        await self.mailbox.put((item, future))
+        if self.run_forever_task.done():
+            # Got a slot only after `run_forever` had exited
+            self._drop_pending()
+        return future
+
+    async def stop(self):
+        """ Stop accepting messages, send the ones already enqueued, and stop """
+        if not self.closed:
+            self.closed = True
+            await self.mailbox.put(_STOP)
+        await self.run_forever_task
+
+
+class AsyncClient:
+    """ Invocation class for `AsyncWebsocket` """
+
+    def __init__(self, name: str, ws: AsyncWebsocket):
+        self.name = name
+        self.ws = ws
+
+    async def send_random_msg(self, prefix: Any) -> asyncio.Future:
+        msg = f'[{self.name}] {prefix}-{"".join(random.sample(string.ascii_letters, 6))}'
+        return await self.ws.enqueue_item(msg)
 
 
 def main():
@@ -60,11 +310,78 @@ def main():
             ])
 
     # wait until all messages are sent
-    wait(fs)
+    wait([f.result() for f in fs])
 
-    # stop thread
+    # stop thread after sending the remaining messages
     ws.stop()
+    print(ws.stats())
+
+
+def benchmark(n: int = 200_000, producers: int = 4):
+    """ Messages/s and batch size histogram of the send loop """
+    for max_batch, linger in ((1, 0.0), (64, 0.0), (256, 0.001)):
+        ws = Websocket(max_batch=max_batch, linger=linger, latency=0.0, verbose=False)
+        clients = [Client(f'c{i}', ws) for i in range(producers)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(producers) as executor:
+            for client in clients:
+                executor.submit(lambda c: [c.send_random_msg(i) for i in range(n // producers)], client)
+        ws.stop()
+        elapsed = time.perf_counter() - start
+
+        stats = ws.stats()
+        buckets = Counter()
+        for size, count in stats['batch_sizes'].items():
+            buckets[1 << (size - 1).bit_length()] += count  # Round up to a power of 2
+        print(f'max_batch={max_batch:<4} linger={linger:<6} {stats["sent"] / elapsed:10,.0f} msgs/s '
+              f'frames={stats["frames"]:<7} histogram(<=size: frames)={dict(sorted(buckets.items()))}')
+
+
+def benchmark_sharded(n: int = 20_000, clients: int = 64, latency: float = 0.002):
+    """ Throughput with 1 to 16 schedulers, when sending a frame takes up to `latency` seconds """
+    for shards in (1, 4, 16):
+        ws = ShardedWebsocket(shards, max_batch=16, latency=latency, verbose=False)
+        senders = [Client(f'c{i}', ws) for i in range(clients)]
+
+        start = time.perf_counter()
+        fs = [senders[i % clients].send_random_msg(i) for i in range(n)]
+        wait(fs)
+        elapsed = time.perf_counter() - start
+        ws.stop()
+
+        print(f'shards={shards:<3} {n / elapsed:10,.0f} msgs/s frames={ws.stats()["frames"]}')
+
+
+def load_test(clients: int = 20_000, messages: int = 5, rate: float = 50_000):
+    """ `clients` concurrent clients on a single thread against the echo stand-in """
+    async def client(c: AsyncClient) -> float:
+        start = time.perf_counter()
+        fs = [await c.send_random_msg(i) for i in range(messages)]
+        await asyncio.gather(*fs)
+        return time.perf_counter() - start
+
+    async def run():
+        server = EchoServer()
+        ws = AsyncWebsocket(server, mailbox_size=4096, max_batch=256, rate=rate)
+
+        start = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(client(AsyncClient(f'c{i}', ws)) for i in range(clients))))
+        elapsed = time.perf_counter() - start
+        await ws.stop()
+
+        print(f'clients={clients} sent={ws.sent} echoed={server.received} '
+              f'{ws.sent / elapsed:10,.0f} msgs/s (rate limit {rate:,.0f}) '
+              f'client p50={latencies[len(latencies) // 2]:.3f}s p99={latencies[int(len(latencies) * 0.99)]:.3f}s '
+              f'frames={sum(ws.batch_sizes.values())}')
+
+    asyncio.run(run())
 
 
 if __name__ == '__main__':
-    main()
+    if 'bench' in sys.argv[1:]:
+        benchmark()
+        benchmark_sharded()
+        load_test()
+    else:
+        main()
@@ -1,8 +1,11 @@
+from collections import Counter
 from enum import Enum
-from typing import Any
+from typing import Any, Dict
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+_EMPTY = object()  # No coalesced payload
+
 
 class PrinterState(Enum):
     PRINTING = 1
@@ -10,27 +13,63 @@ class PrinterState(Enum):
 
 
 class Printer:
-    lock = threading.Lock()
-
-    def __init__(self):
+    def __init__(self, coalesce: bool = False):
+        """
+        :param coalesce: If True, instead of dropping the content arriving during PRINTING,
+            keep only the newest one and print it as soon as the printer is free.
+        """
+        self.coalesce = coalesce
         self.state = PrinterState.STANDBY
+        self._lock = threading.Lock()  # Per instance, so that printers don't contend with each other
+        self._latest = _EMPTY
+        self._counters = Counter()
+
+    def _compare_and_set(self, expected: PrinterState, new: PrinterState) -> bool:
+        """ Set `state` to `new` only if it is `expected` """
+        with self._lock:
+            if self.state != expected:
+                return False
+            self.state = new
+            return True
 
     def print(self, content: Any):
-        with self.lock:
-            # if printer in PRINTING state, return
-            if self.state == PrinterState.PRINTING:
-                return
-            self.state = PrinterState.PRINTING
+        if not self._compare_and_set(PrinterState.STANDBY, PrinterState.PRINTING):
+            with self._lock:
+                if self.state == PrinterState.PRINTING:
+                    # if printer in PRINTING state, return
+                    if not self.coalesce:
+                        self._counters['balked'] += 1
+                        return
+                    # Replace the older content waiting
+                    self._latest = content
+                    self._counters['coalesced'] += 1
+                    return
 
-        print(content)
-        self.state = PrinterState.STANDBY
+            # Printer became free in the meantime
+            return self.print(content)
+
+        while True:
+            print(content)
+            with self._lock:
+                self._counters['executed'] += 1
+                # Print the newest content arrived while printing, before going back to STANDBY
+                content, self._latest = self._latest, _EMPTY
+                if content is _EMPTY:
+                    self.state = PrinterState.STANDBY
+                    return
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {key: self._counters[key] for key in ('balked', 'coalesced', 'executed')}
 
 
 def main():
-    printer = Printer()
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        for i in range(0, 50):
-            executor.submit(printer.print, i)
+    for coalesce in (False, True):
+        printer = Printer(coalesce=coalesce)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for i in range(0, 50):
+                executor.submit(printer.print, i)
+        print(f'coalesce={coalesce}', printer.counters())
 
 
 if __name__ == '__main__':
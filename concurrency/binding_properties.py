@@ -1,47 +1,185 @@
 from __future__ import annotations
-from typing import List
+
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_transaction = threading.local()
 
 
 class Observer:
     def __init__(self, name: str):
         self.name = name
         self.observers: List[Observer] = []
-        self.blocked_observers: List[Observer] = []  # Do not notify to these observers
+        self._observer_set = set()
 
     def subscribe(self, observer: Observer):
-        if observer not in self.observers:
+        if observer not in self._observer_set:
+            self._observer_set.add(observer)
             self.observers.append(observer)
 
-    def add_blocked_observer(self, observer: Observer):
-        if observer not in self.blocked_observers:
-            self.blocked_observers.append(observer)
-
-    def remove_blocked_observer(self, observer: Observer):
-        if observer in self.blocked_observers:
-            self.blocked_observers.append(observer)
-
     def notify(self):
         """ Send notification to observers """
         print(f'[{self.name}] Notify to {self.observers}')
-        for observer in self.observers:
-            observer.notified(self)
+        for observer, sender in propagation_order(self):
+            observer.notified(sender)
 
     def notified(self, sender: Observer):
         """ notified """
-        # Prevent mutual invocation
-        if sender in self.blocked_observers:
+        print(f'[{self.name}] Notified by {sender.name}')
+
+    def __repr__(self):
+        return f'Observer({self.name})'
+
+
+def propagation_order(source: Observer) -> List[Tuple[Observer, Observer]]:
+    """
+    List of (observer, sender) to notify in a wave started by `source`.
+    Every observer is visited at most once per wave, so cycles don't cause an infinite loop.
+    An observer comes after all of its senders (topological order), except where a cycle
+    makes it impossible. Then the earliest reached observer of the cycle goes first.
+    """
+    # Find the observers reachable in this wave. Visited ones are the keys of `in_degree`, local to
+    # the wave, so that waves of other threads over the same observers don't interfere.
+    reached = [source]
+    in_degree: Dict[Observer, int] = {}
+    for node in reached:
+        for observer in node.observers:
+            if observer is source:
+                continue
+            if observer not in in_degree:
+                in_degree[observer] = 0
+                reached.append(observer)
+            in_degree[observer] += 1
+
+    order = []
+    senders: Dict[Observer, Observer] = {}
+    frontier = deque()  # Reached by a sender, but waiting for its other senders
+    ready = deque([source])
+    done = {source}
+    while ready or frontier:
+        if not ready:
+            # Only cycles are left. Break one at the earliest reached observer.
+            node = frontier.popleft()
+            if node in done:
+                continue
+            done.add(node)
+            order.append((node, senders[node]))
+            ready.append(node)
+            continue
+
+        node = ready.popleft()
+        for observer in node.observers:
+            if observer is source or observer in done:
+                continue
+            if observer not in senders:
+                senders[observer] = node
+                frontier.append(observer)
+            in_degree[observer] -= 1
+            if in_degree[observer] == 0:
+                done.add(observer)
+                order.append((observer, senders[observer]))
+                ready.append(observer)
+
+    return order
+
+
+class Property(Observer):
+    """
+    Observable value. Bound properties follow its value, and are notified only when it actually changes.
+    A wave visits each property at most once, so two-way bindings converge without ping-pong.
+    """
+
+    def __init__(self, name: str, value: Any = None):
+        super().__init__(name)
+        self._value = value
+        self.changes = 0
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    def set(self, value: Any):
+        if value == self._value:
             return
-        self.add_blocked_observer(sender)
 
-        # Otherwise, infinite loop can occur when this object subscribes one of the subscribers.
-        print(f'[{self.name}] Notified by {sender.name}')
+        pending = getattr(_transaction, 'pending', None)
+        if pending is not None:
+            # In `batch()`, remember the value before the batch and defer the notification
+            pending.setdefault(self, self._value)
+            self._value = value
+            return
+
+        self._value = value
+        self.changes += 1
         self.notify()
 
-        # Resume blocked observer
-        self.remove_blocked_observer(sender)
+    def bind(self, other: Property, two_way: bool = False):
+        """ Make `other` follow this value, and vice versa if `two_way` """
+        self.subscribe(other)
+        if two_way:
+            other.subscribe(self)
+        other.set(self._value)
+
+    def notify(self):
+        """
+        Propagate only along the observers whose value changed in this wave.
+        An observer of several changed senders takes the value of the last one in the order.
+        """
+        changed_sender = dict.fromkeys(self.observers, self)
+        for observer, _ in propagation_order(self):
+            sender = changed_sender.get(observer)
+            if sender is not None and observer.notified(sender):
+                for downstream in observer.observers:
+                    changed_sender[downstream] = observer
+
+    def notified(self, sender: Observer) -> bool:
+        """ Take the value of `sender`, and return whether it changed """
+        if not isinstance(sender, Property):
+            return False  # Nothing to follow
+
+        value = sender.value
+        if value == self._value:
+            return False
+
+        self._value = value
+        self.changes += 1
+        return True
 
     def __repr__(self):
-        return f'Observer({self.name})'
+        return f'Property({self.name}={self._value!r})'
+
+
+@contextmanager
+def batch() -> Iterator[None]:
+    """
+    Defer the propagation of `Property.set` until the end of the block, then notify once per
+    property whose value differs from before the block. Values are restored if the block raises.
+    """
+    if getattr(_transaction, 'pending', None) is not None:
+        # Nested batch joins the outer one
+        yield
+        return
+
+    pending: Dict[Property, Any] = {}
+    _transaction.pending = pending
+    try:
+        yield
+    except BaseException:
+        for prop, old in pending.items():
+            prop._value = old
+        raise
+    finally:
+        _transaction.pending = None
+
+    for prop, old in pending.items():
+        if prop.value != old:
+            prop.changes += 1
+            prop.notify()
 
 
 def main():
@@ -55,6 +193,37 @@ def main():
 
     obj1.notify()
 
+    # Two-way binding converges without ping-pong
+    width, model, view = Property('width', 0), Property('model'), Property('view')
+    width.bind(model, two_way=True)
+    model.bind(view)
+
+    # Bulk update notifies once, instead of once per `set`
+    with batch():
+        for i in range(100):
+            width.set(i)
+    view.set(7)
+    print(width, model, view, f'changes of view: {view.changes}')
+
+
+def benchmark(n: int = 100_000, degree: int = 3, seed: Optional[int] = 0):
+    """ A wave over `n` observers, randomly subscribed to each other with many cycles """
+    rng = random.Random(seed)
+    nodes = [Observer(f'obj{i}') for i in range(n)]
+    for i, node in enumerate(nodes):
+        # Forward edges make the graph connected, random edges make cycles
+        node.subscribe(nodes[(i + 1) % n])
+        for _ in range(degree - 1):
+            node.subscribe(nodes[rng.randrange(n)])
+
+    for _ in range(3):
+        start = time.perf_counter()
+        order = propagation_order(nodes[0])
+        elapsed = time.perf_counter() - start
+        assert len(order) == len({observer for observer, _ in order}) == n - 1
+        print(f'nodes={n} edges={sum(len(node.observers) for node in nodes)} '
+              f'notified={len(order)} {elapsed:.3f}s')
+
 
 if __name__ == '__main__':
-    main()
+    benchmark() if 'bench' in sys.argv[1:] else main()
@@ -1,11 +1,89 @@
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Optional, TextIO
+import os
+import sys
 import threading
+import time
+
+
+class AsyncLogSink:
+    """
+    Buffer of log lines, written by a background thread in batches with a single `write`.
+    `deque.append` is thread-safe, so logging threads don't take a lock while the buffer is not full.
+    """
+
+    def __init__(self, stream: TextIO = None, capacity: int = 65536, block: bool = False,
+                 interval: float = 0.05):
+        """
+        :param capacity: Max number of buffered lines, which bounds the memory
+        :param block: If True, wait while the buffer is full. Otherwise, drop the line.
+        :param interval: Max seconds before buffered lines are written
+        """
+        self.stream = stream or sys.stdout
+        self.capacity = capacity
+        self.block = block
+        self.interval = interval
+        self.dropped = 0
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._not_full = threading.Condition()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name='[Thread-LogWriter]', daemon=True)
+        self._writer.start()
+
+    def write(self, line: str):
+        if self._closed:
+            self.stream.write(line + '\n')
+            return
+
+        if len(self._buffer) >= self.capacity:
+            with self._not_full:
+                if not self.block:
+                    self.dropped += 1
+                    return
+                self._wakeup.set()
+                self._not_full.wait_for(lambda: len(self._buffer) < self.capacity or self._closed)
+
+        self._buffer.append(line)
+        # Wake up the writer early once half of the buffer is used
+        if len(self._buffer) >= self.capacity // 2 and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed or self._buffer:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        lines = []
+        try:
+            for _ in range(len(self._buffer)):
+                lines.append(self._buffer.popleft())
+        except IndexError:
+            pass
+
+        if lines:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+        with self._not_full:
+            self._not_full.notify_all()
+
+    def close(self):
+        """ Write the remaining lines and stop the writer """
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
 
 
 class Logger:
     _instance = None
     _lock = threading.Lock()
     _log_lock = threading.Lock()
+    sink: Optional[AsyncLogSink] = None  # If set, `log` doesn't wait for the terminal I/O
 
     def __new__(cls):
         # To reduce the overhead of acquiring a lock, check `_instance` first
@@ -18,6 +96,10 @@ class Logger:
         return cls._instance
 
     def log(self, *args):
+        if self.sink is not None:
+            self.sink.write(' '.join(map(str, args)))
+            return
+
         with self._log_lock:
             print(*args)
 
@@ -32,6 +114,42 @@ def main():
         for _ in range(10):
             executor.submit(create_logger)
 
+    Logger.sink = AsyncLogSink()
+    with ThreadPoolExecutor() as executor:
+        for _ in range(10):
+            executor.submit(create_logger)
+    Logger.sink.close()
+    Logger.sink = None
+
+
+def benchmark(threads: int = 32, lines: int = 10_000):
+    """ Lines/s with `threads` threads logging, written to /dev/null """
+    def log_lines():
+        log = Logger()
+        for i in range(lines):
+            log.log('benchmark', threading.get_ident(), i)
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        results = []
+        for mode in ('print', 'async sink(drop)', 'async sink(block)'):
+            if mode != 'print':
+                Logger.sink = AsyncLogSink(devnull, block=mode.endswith('(block)'))
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                for _ in range(threads):
+                    executor.submit(log_lines)
+            if Logger.sink is not None:
+                Logger.sink.close()
+            elapsed = time.perf_counter() - start
+
+            dropped = Logger.sink.dropped if Logger.sink else 0
+            Logger.sink = None
+            results.append(f'{mode:<18} {threads * lines / elapsed:12,.0f} lines/s dropped={dropped}')
+
+    for line in results:
+        print(line)
+
 
 if __name__ == '__main__':
-    main()
+    benchmark() if 'bench' in sys.argv[1:] else main()
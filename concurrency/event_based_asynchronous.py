@@ -1,10 +1,33 @@
 """ Referred to concurrent.futures.thread and concurrent.futures._base """
 
+import asyncio
+import heapq
 import itertools
+import logging
+import math
+import multiprocessing
+import pickle
 import queue
+import random
+import sys
 import time
 import threading
-from typing import Iterable, Union, Callable, Any
+import weakref
+from collections import Counter, defaultdict, deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import connection, shared_memory
+from typing import Iterable, Iterator, List, Dict, Union, Callable, Any, Optional
+
+_PENDING = 'PENDING'
+_RUNNING = 'RUNNING'
+_CANCELLED = 'CANCELLED'
+_FINISHED = 'FINISHED'
+
+LOGGER = logging.getLogger(__name__)
+
+_WAKE = object()  # Wakes up an idle executor to steal work
+_RETIRE = object()  # Returned to an executor which has been idle for too long
 
 
 def lprint(*args, **kwargs):
@@ -15,46 +38,423 @@ def lprint(*args, **kwargs):
         print(*args, **kwargs)
 
 
+class Future:
+    """
+    Lightweight version of `concurrent.futures.Future`.
+    `_lock` guards the state, and `_waiter` is held until the future is done
+    so that waiters just block on acquiring it instead of using a `Condition`.
+    """
+    __slots__ = ('_lock', '_waiter', '_state', '_result', '_exception', '_callbacks')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiter = threading.Lock()
+        self._waiter.acquire()  # Released when the future is done
+        self._state = _PENDING
+        self._result = None
+        self._exception: Optional[BaseException] = None
+        self._callbacks: Optional[list] = None
+
+    def cancel(self) -> bool:
+        """ Cancel the future if it has not started running yet """
+        with self._lock:
+            if self._state in (_RUNNING, _FINISHED):
+                return False
+            if self._state == _CANCELLED:
+                return True
+            self._state = _CANCELLED
+            callbacks, self._callbacks = self._callbacks, None
+
+        self._complete(callbacks)
+        return True
+
+    def cancelled(self) -> bool:
+        return self._state == _CANCELLED
+
+    def running(self) -> bool:
+        return self._state == _RUNNING
+
+    def done(self) -> bool:
+        return self._state in (_CANCELLED, _FINISHED)
+
+    def set_running(self) -> bool:
+        """ Called by an executor before running. Return False if the future was cancelled. """
+        with self._lock:
+            if self._state == _CANCELLED:
+                return False
+            self._state = _RUNNING
+            return True
+
+    def set_result(self, result: Any):
+        with self._lock:
+            self._result = result
+            self._state = _FINISHED
+            callbacks, self._callbacks = self._callbacks, None
+
+        self._complete(callbacks)
+
+    def set_exception(self, exception: BaseException):
+        with self._lock:
+            self._exception = exception
+            self._state = _FINISHED
+            callbacks, self._callbacks = self._callbacks, None
+
+        self._complete(callbacks)
+
+    def _complete(self, callbacks: Optional[list]):
+        self._waiter.release()
+        for fn in callbacks or ():
+            self._invoke_callback(fn)
+
+    def _invoke_callback(self, fn: Callable[['Future'], Any]):
+        try:
+            fn(self)
+        except Exception:
+            LOGGER.exception('exception calling callback for %r', self)
+
+    def add_done_callback(self, fn: Callable[['Future'], Any]):
+        """ Call `fn(future)` when done, or right now if already done """
+        with self._lock:
+            if not self.done():
+                if self._callbacks is None:
+                    self._callbacks = []
+                self._callbacks.append(fn)
+                return
+
+        self._invoke_callback(fn)
+
+    def _wait(self, timeout: Optional[float]):
+        if self.done():
+            return
+        if not self._waiter.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError()
+        # Pass the latch on to the other waiters
+        self._waiter.release()
+
+    def result(self, timeout: float = None) -> Any:
+        self._wait(timeout)
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout: float = None) -> Optional[BaseException]:
+        self._wait(timeout)
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        return self._exception
+
+
+class _LoopBridge:
+    """
+    Complete asyncio futures of an event loop with the results of `Future`.
+    Completions from the executors are batched, so that the loop is woken up
+    by a single `call_soon_threadsafe` for all the work done in the meantime.
+    The loop is held weakly, since the bridge is the value of a `WeakKeyDictionary` keyed by the loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = weakref.ref(loop)
+        self.lock = threading.Lock()
+        self.completed: List[tuple] = []  # (asyncio future, Future)
+        self.scheduled = False
+        self.wakeups = 0
+
+    def link(self, future: Future) -> asyncio.Future:
+        """ Called on the loop thread. Return the asyncio future following `future`. """
+        aio_future = self._loop().create_future()
+        aio_future.add_done_callback(lambda f: f.cancelled() and future.cancel())
+        future.add_done_callback(lambda f: self._on_done(aio_future, f))
+        return aio_future
+
+    def _on_done(self, aio_future: asyncio.Future, future: Future):
+        """ Called on an executor thread """
+        with self.lock:
+            self.completed.append((aio_future, future))
+            if self.scheduled:
+                return
+            self.scheduled = True
+            self.wakeups += 1
+
+        loop = self._loop()
+        if loop is None:
+            return  # Loop is gone
+        try:
+            loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            pass  # Loop is closed
+
+    def _flush(self):
+        """ Called on the loop thread """
+        with self.lock:
+            completed, self.completed = self.completed, []
+            self.scheduled = False
+
+        for aio_future, future in completed:
+            if aio_future.done():
+                continue  # Cancelled by the awaiting side
+            if future.cancelled():
+                aio_future.cancel()
+            elif future.exception() is not None:
+                aio_future.set_exception(future.exception())
+            else:
+                aio_future.set_result(future.result())
+
+
 class _WorkItem:
-    def __init__(self, fn: Callable, callback: Callable, args: Iterable, kwargs: dict):
+    __slots__ = ('future', 'fn', 'callback', 'args', 'kwargs')
+
+    def __init__(self, future: Future, fn: Callable, callback: Optional[Callable],
+                 args: Iterable, kwargs: dict):
+        self.future = future
         self.fn = fn
         self.callback = callback
         self.args = args
         self.kwargs = kwargs
 
     def run(self):
-        res = self.fn(*self.args, **self.kwargs)
+        if not self.future.set_running():
+            return  # Cancelled
+
+        try:
+            res = self.fn(*self.args, **self.kwargs)
+        except BaseException as exc:
+            self.future.set_exception(exc)
+            return
+
+        self.future.set_result(res)
         if callable(self.callback):
-            self.callback(res)
+            try:
+                self.callback(res)
+            except Exception:
+                LOGGER.exception('callback raised an exception')
+
+
+class DeadlineExceeded(Exception):
+    """ Set to the future of the work dequeued after its deadline """
+
+
+class _PriorityWorkItem(_WorkItem):
+    __slots__ = ('deadline', 'drop_expired')
+
+    def __init__(self, future: Future, fn: Callable, callback: Optional[Callable],
+                 args: Iterable, kwargs: dict, deadline: Optional[float], drop_expired: bool):
+        super().__init__(future, fn, callback, args, kwargs)
+        self.deadline = deadline
+        self.drop_expired = drop_expired
+
+    def run(self):
+        if self.drop_expired and self.deadline is not None and time.monotonic() > self.deadline:
+            if self.future.set_running():
+                self.future.set_exception(DeadlineExceeded())
+            return
+
+        super().run()
+
+
+class _PriorityQueue:
+    """ Heap-based `_work_queue` which also records the queueing delay per priority """
+
+    def __init__(self, samples: int = 10_000):
+        self._heap = []
+        self._condition = threading.Condition(threading.Lock())
+        self._counter = itertools.count().__next__
+        self.delays: Dict[int, deque] = defaultdict(lambda: deque(maxlen=samples))
+        self.expired = Counter()
+
+    def put(self, item: Any, priority: int = 0, deadline: float = None):
+        # Sentinels(ex. `None` for shutdown) go after all the work
+        if isinstance(item, _WorkItem):
+            key = (priority, math.inf if deadline is None else deadline)
+        else:
+            key = (math.inf, math.inf)
+
+        with self._condition:
+            heapq.heappush(self._heap, (*key, self._counter(), time.monotonic(), item))
+            self._condition.notify()
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def get(self, block: bool = True, timeout: float = None) -> Any:
+        with self._condition:
+            if not block and not self._heap:
+                raise queue.Empty
+            if not self._condition.wait_for(lambda: self._heap, timeout):
+                raise queue.Empty
+            priority, deadline, _, enqueued, item = heapq.heappop(self._heap)
+
+            if isinstance(item, _WorkItem):
+                now = time.monotonic()
+                self.delays[priority].append(now - enqueued)
+                if now > deadline:
+                    self.expired[priority] += 1
+
+        return item
+
+
+def _process_chunk(fn: Callable, chunk: tuple) -> list:
+    """ Run several calls as a single work item """
+    return [fn(*args) for args in chunk]
 
 
 class Executor:
     _counter = itertools.count().__next__
 
-    def __init__(self, max_worker: int = None):
+    def __init__(self, max_worker: int = None, work_stealing: bool = False,
+                 min_worker: int = 0, idle_timeout: float = None):
+        """
+        :param work_stealing: If True, each executor owns a local deque.
+            Work submitted from inside an executor goes to its own deque, and
+            idle executors steal from the others. Otherwise, all executors
+            share `_work_queue`.
+        :param min_worker: Number of executors kept alive even when idle
+        :param idle_timeout: Seconds after which an idle executor above `min_worker` retires.
+            None to keep executors until shutdown.
+        """
         self.max_worker = max_worker or 4
+        self.min_worker = min(min_worker, self.max_worker)
+        self.idle_timeout = idle_timeout
+        self.work_stealing = work_stealing
         self._work_queue = queue.SimpleQueue()
         self._threads = set()
         self.lock = threading.Lock()
         self._shutdown = False
+        self._idle = 0
+        self._idle_lock = threading.Lock()
+        self._stats = Counter()
+
+        # Used only for work stealing
+        self._local = threading.local()
+        self._deques: List[deque] = []
+
+        # Used only for `submit_async`
+        self._bridges = weakref.WeakKeyDictionary()  # event loop: _LoopBridge
+
+    def submit(self, fn: Callable, callback: Optional[Callable], *args, **kwargs) -> Future:
+        """ Make a reservation to call `fn` with `callback`, and return its `Future` """
+        future = Future()
+        work = _WorkItem(future, fn, callback, args, kwargs)
+
+        local: Optional[deque] = getattr(self._local, 'deque', None)
+        if local is not None:
+            # Submitted from inside an executor: push to its own deque without the lock.
+            # The owner drains it before exiting, so this is allowed during shutdown too.
+            local.append(work)
+            if self._idle and len(local) == 1:
+                # Wake up one idle executor per burst, not per work
+                self._work_queue.put(_WAKE)
+            if len(self._threads) < self.max_worker and len(local) > self._idle:
+                with self.lock:
+                    self._spawn_executor(len(local))
+            return future
 
-    def submit(self, fn: Callable, callback: Callable, *args, **kwargs):
-        """ Make a reservation to call `fn` with `callback` """
         with self.lock:
-            work = _WorkItem(fn, callback, args, kwargs)
-            name = f'[Thread-Exe({self._counter()})]'
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
             self._work_queue.put(work)
-            self._spawn_executor(name)
+            self._spawn_executor()
+
+        return future
+
+    def submit_async(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Awaitable `submit`. Must be called on the event loop thread.
+        Returns a plain asyncio future rather than a coroutine, so no task is needed per call.
+        """
+        loop = asyncio.get_running_loop()
+        bridge = self._bridges.get(loop)
+        if bridge is None:
+            with self.lock:
+                bridge = self._bridges.setdefault(loop, _LoopBridge(loop))
+
+        return bridge.link(self.submit(fn, None, *args, **kwargs))
+
+    def map(self, fn: Callable, *iterables: Iterable, timeout: float = None,
+            chunksize: int = 1) -> Iterator:
+        """
+        Same as the built-in `map`, but calls run concurrently.
+        Every `chunksize` calls are packed into one `_WorkItem`, which saves
+        a future, a queue operation and a lock round trip per call.
+        """
+        if chunksize < 1:
+            raise ValueError('chunksize must be >= 1')
+
+        end_time = None if timeout is None else time.monotonic() + timeout
+        args = zip(*iterables)
+        fs = [self.submit(_process_chunk, None, fn, chunk)
+              for chunk in iter(lambda: tuple(itertools.islice(args, chunksize)), ())]
 
-    def _spawn_executor(self, name: str):
-        if len(self._threads) < self.max_worker:
+        def result_iterator():
+            try:
+                fs.reverse()
+                while fs:
+                    remaining = None if end_time is None else max(end_time - time.monotonic(), 0)
+                    yield from fs.pop().result(remaining)
+            finally:
+                # Cancel the pending chunks if the iterator is closed or failed
+                for future in fs:
+                    future.cancel()
+
+        return result_iterator()
+
+    def _spawn_executor(self, waiting: int = None):
+        """ Spawn an executor only if the waiting work outnumbers the idle executors """
+        if self._shutdown or len(self._threads) >= self.max_worker:
+            return
+        if waiting is None:
+            waiting = self._work_queue.qsize()
+        if len(self._threads) >= self.min_worker and waiting <= self._idle:
+            return
+
+        name = f'[Thread-Exe({self._counter()})]'
+        if self.work_stealing:
+            local = deque()
+            # Copy on write, so that thieves can iterate `_deques` without the lock
+            self._deques = self._deques + [local]
+            thr = threading.Thread(target=self._stealing_executor, args=(local,), name=name)
+        else:
             thr = threading.Thread(target=self._executor, name=name)
-            thr.start()
-            self._threads.add(thr)
+        thr.start()
+        self._threads.add(thr)
+        self._stats['spawned'] += 1
+        self._stats['peak'] = max(self._stats['peak'], len(self._threads))
+
+    def _wait_work(self, local: deque = None) -> Any:
+        """
+        Block until work arrives.
+        Return `_RETIRE` instead, if idle for `idle_timeout` and there are more than `min_worker` executors.
+        """
+        while True:
+            with self._idle_lock:
+                self._idle += 1
+            try:
+                return self._work_queue.get(block=True, timeout=self.idle_timeout)
+            except queue.Empty:
+                pass
+            finally:
+                with self._idle_lock:
+                    self._idle -= 1
+
+            # Check the queue under the lock, so that no work is left without an executor
+            with self.lock:
+                if len(self._threads) > self.min_worker and self._work_queue.qsize() == 0:
+                    self._threads.discard(threading.current_thread())
+                    if local is not None:
+                        self._deques = [d for d in self._deques if d is not local]
+                    self._stats['retired'] += 1
+                    return _RETIRE
 
     def _executor(self):
         while True:
-            work: Union[_WorkItem, None] = self._work_queue.get(block=True)
+            try:
+                work: Union[_WorkItem, None] = self._work_queue.get(block=False)
+            except queue.Empty:
+                work = self._wait_work()
+                if work is _RETIRE:
+                    break
+
             if work is not None:
                 work.run()
                 continue
@@ -64,6 +464,53 @@ class Executor:
                 self._work_queue.put(None)
                 break
 
+    def _steal(self, local: deque) -> Optional[_WorkItem]:
+        """
+        Take the oldest work from the other executors' deques.
+        If the victim still has work, wake up another idle executor, so that a burst woken
+        with a single `_WAKE` spreads over all the idle executors.
+        """
+        deques = self._deques
+        offset = random.randrange(len(deques))
+        for i in range(len(deques)):
+            victim = deques[(offset + i) % len(deques)]
+            if victim is local:
+                continue
+            try:
+                work = victim.popleft()
+            except IndexError:
+                continue
+
+            if victim and self._idle:
+                self._work_queue.put(_WAKE)
+            return work
+
+        return None
+
+    def _stealing_executor(self, local: deque):
+        self._local.deque = local
+        while True:
+            try:
+                # Newest first (LIFO) for the owner, oldest first (FIFO) for the thieves
+                work = local.pop()
+            except IndexError:
+                work = self._steal(local)
+
+            if work is None:
+                work = self._wait_work(local)
+                if work is _RETIRE:
+                    break
+
+            if work is _WAKE:
+                continue
+            if work is not None:
+                work.run()
+                continue
+
+            if self._shutdown:
+                self._work_queue.put(None)
+                break
+
     def __enter__(self):
         return self
 
@@ -73,8 +520,309 @@ class Executor:
 
             # Wake up executor
             self._work_queue.put(None)
-            for thr in self._threads:
-                thr.join()
+            threads = list(self._threads)
+
+        # Join without the lock since running work may still submit to its own deque
+        for thr in threads:
+            thr.join()
+
+        return False
+
+    def counters(self) -> Dict[str, int]:
+        """ Current size of the pool, and how it has grown and shrunk """
+        with self.lock:
+            return {
+                'workers': len(self._threads),
+                'idle': self._idle,
+                'queued': self._work_queue.qsize(),
+                'peak': self._stats['peak'],
+                'spawned': self._stats['spawned'],
+                'retired': self._stats['retired'],
+            }
+
+
+class PriorityExecutor(Executor):
+    """
+    Executor whose `_work_queue` is a heap.
+    Work with a lower `priority` runs first, and the earlier deadline first within the same priority.
+    """
+
+    def __init__(self, max_worker: int = None, drop_expired: bool = True):
+        """
+        :param drop_expired: If True, work dequeued after its deadline is not run and
+            its future gets `DeadlineExceeded`. Otherwise, it runs and is only counted as expired.
+        """
+        super().__init__(max_worker)
+        self.drop_expired = drop_expired
+        self._work_queue = _PriorityQueue()
+
+    def submit(self, fn: Callable, callback: Optional[Callable], *args, **kwargs) -> Future:
+        return self.submit_with_priority(fn, callback, *args, **kwargs)
+
+    def submit_with_priority(self, fn: Callable, callback: Optional[Callable], *args,
+                             priority: int = 0, deadline: float = None, **kwargs) -> Future:
+        """
+        :param priority: Lower value runs first
+        :param deadline: Absolute time in `time.monotonic()` after which the work is expired
+        """
+        future = Future()
+        work = _PriorityWorkItem(future, fn, callback, args, kwargs, deadline, self.drop_expired)
+        with self.lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._work_queue.put(work, priority, deadline)
+            self._spawn_executor()
+
+        return future
+
+    def queueing_delay(self) -> Dict[int, dict]:
+        """ p50/p99 queueing delay(seconds) and the number of expired work per priority """
+        stats = {}
+        with self._work_queue._condition:
+            for priority, delays in sorted(self._work_queue.delays.items()):
+                samples = sorted(delays)
+                stats[priority] = {
+                    'count': len(samples),
+                    'p50': samples[int(len(samples) * 0.50)],
+                    'p99': samples[min(int(len(samples) * 0.99), len(samples) - 1)],
+                    'expired': self._work_queue.expired[priority],
+                }
+
+        return stats
+
+
+class _SharedArg:
+    """ Placeholder of a large bytes-like argument, which is shipped through shared memory """
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+
+def _process_worker(call_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue):
+    """ Run pickled batches of `(work_id, fn, args, kwargs)` and send back the pickled batch of results """
+    while True:
+        batch = call_queue.get()
+        if batch is None:
+            break
+
+        results = []
+        for work_id, fn, args, kwargs in pickle.loads(batch):
+            segments = []
+            try:
+                # Large arguments are given as `memoryview`, valid only during the call
+                args = list(args)
+                for i, arg in enumerate(args):
+                    if isinstance(arg, _SharedArg):
+                        shm = shared_memory.SharedMemory(name=arg.name)
+                        segments.append(shm)
+                        args[i] = shm.buf[:arg.size]
+                results.append((work_id, True, fn(*args, **kwargs)))
+            except BaseException as exc:
+                results.append((work_id, False, exc))
+            finally:
+                for arg in args:
+                    if isinstance(arg, memoryview):
+                        arg.release()
+                for shm in segments:
+                    shm.close()
+
+        # Pickle here, since `Queue.put` pickles in its feeder thread where errors are only printed
+        try:
+            result_queue.put(pickle.dumps(results))
+        except Exception:
+            result_queue.put(pickle.dumps([_picklable(result) for result in results]))
+
+
+def _picklable(result: tuple) -> tuple:
+    """ `result` itself, or a failure if its value is not picklable """
+    work_id, ok, res = result
+    try:
+        pickle.dumps(res)
+        return result
+    except Exception as exc:
+        return work_id, False, exc if ok else RuntimeError(repr(res))
+
+
+class ProcessExecutor(Executor):
+    """
+    Executor running work in worker processes, for CPU-bound work.
+    Submitted work is pickled in batches, and large bytes-like arguments are
+    copied into `shared_memory` instead of being pickled.
+    Worker processes are started lazily, only while there is pending work.
+    """
+
+    def __init__(self, max_worker: int = None, batch_size: int = 64, shm_threshold: int = 1 << 20):
+        """
+        :param batch_size: Max number of work pickled and sent at once
+        :param shm_threshold: bytes-like arguments larger than this are shipped through shared memory
+        """
+        super().__init__(max_worker or multiprocessing.cpu_count())
+        self.batch_size = batch_size
+        self.shm_threshold = shm_threshold
+        self._work_id = itertools.count().__next__
+        self._pending: Dict[int, tuple] = {}  # work_id: (future, callback, shared memories)
+        self._processes = []
+        self._call_queue = None
+        self._result_queue = None
+        self._dispatcher = None
+        self._collector = None
+        self._broken = None  # Reason why the executor can't be used any more
+
+    def submit(self, fn: Callable, callback: Optional[Callable], *args, **kwargs) -> Future:
+        future = Future()
+        with self.lock:
+            if self._broken:
+                raise BrokenProcessPool(self._broken)
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+
+            segments = []
+            args = tuple(self._share(arg, segments) for arg in args)
+            work_id = self._work_id()
+            self._pending[work_id] = (future, callback, segments)
+            self._work_queue.put((work_id, fn, args, kwargs))
+            self._spawn_executor()
+
+        return future
+
+    def _share(self, arg: Any, segments: list) -> Any:
+        if not isinstance(arg, (bytes, bytearray, memoryview)) or len(arg) <= self.shm_threshold:
+            return arg
+
+        shm = shared_memory.SharedMemory(create=True, size=len(arg))
+        shm.buf[:len(arg)] = arg
+        segments.append(shm)
+        return _SharedArg(shm.name, len(arg))
+
+    def _spawn_executor(self, waiting: int = None):
+        if self._dispatcher is None:
+            self._call_queue = multiprocessing.Queue()
+            self._result_queue = multiprocessing.Queue()
+            self._dispatcher = threading.Thread(target=self._dispatch, name='[Thread-Dispatcher]')
+            self._collector = threading.Thread(target=self._collect, name='[Thread-Collector]')
+            self._dispatcher.start()
+            self._collector.start()
+
+        # Start another process only when the pending work outnumbers the processes
+        if len(self._processes) < min(self.max_worker, len(self._pending)):
+            proc = multiprocessing.Process(target=_process_worker,
+                                           args=(self._call_queue, self._result_queue), daemon=True)
+            proc.start()
+            self._processes.append(proc)
+
+    def _dispatch(self):
+        """ Drain `_work_queue` into batches, and send them to the processes """
+        while True:
+            batch = [self._work_queue.get(block=True)]
+            # Smaller batches while there is little work, so that it is spread over the processes
+            batch_size = min(self.batch_size, -(-len(self._pending) // self.max_worker))
+            while batch[-1] is not None and len(batch) < batch_size:
+                try:
+                    batch.append(self._work_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            shutdown = batch[-1] is None
+            if shutdown:
+                batch.pop()
+
+            if batch:
+                self._send(batch)
+            if shutdown:
+                for _ in self._processes:
+                    self._call_queue.put(None)
+                break
+
+    def _send(self, batch: list):
+        """ Pickle `batch` here, and fail the work which is not picklable instead of sending it """
+        try:
+            data = pickle.dumps(batch)
+        except Exception:
+            sendable = []
+            for work in batch:
+                try:
+                    pickle.dumps(work)
+                    sendable.append(work)
+                except Exception as exc:
+                    self._finish(work[0], False, exc)
+            if not sendable:
+                return
+            data = pickle.dumps(sendable)
+
+        self._call_queue.put(data)
+
+    def _collect(self):
+        """ Complete the futures with the results from the processes, and watch the processes die """
+        # Same as `concurrent.futures.process`, wait on the reader end of the queue next to the processes
+        reader = self._result_queue._reader
+        while True:
+            with self.lock:
+                sentinels = {proc.sentinel: proc for proc in self._processes}
+            # Timeout to watch the processes started in the meantime too
+            ready = connection.wait([reader, *sentinels], timeout=0.1)
+            if reader in ready:
+                # Results sent right before dying are read first
+                results = self._result_queue.get()
+                if results is None:
+                    break
+                for work_id, ok, res in pickle.loads(results):
+                    self._finish(work_id, ok, res)
+                continue
+
+            dead = [sentinels[sentinel] for sentinel in ready]
+            if any(proc.exitcode != 0 or not self._shutdown for proc in dead):
+                self._break('a worker process terminated abruptly')
+                break
+
+    def _break(self, reason: str):
+        """ Fail all the pending work, and refuse new work """
+        with self.lock:
+            self._broken = reason
+            work_ids = list(self._pending)
+        for work_id in work_ids:
+            self._finish(work_id, False, BrokenProcessPool(reason))
+        for proc in self._processes:
+            proc.terminate()
+
+    def _finish(self, work_id: int, ok: bool, res: Any):
+        with self.lock:
+            entry = self._pending.pop(work_id, None)
+        if entry is None:
+            return  # Already failed by `_break`
+        future, callback, segments = entry
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+        if not future.set_running():
+            return  # Cancelled
+        if not ok:
+            future.set_exception(res)
+            return
+        future.set_result(res)
+        if callable(callback):
+            try:
+                callback(res)
+            except Exception:
+                LOGGER.exception('callback raised an exception')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.lock:
+            self._shutdown = True
+            if self._dispatcher is None:
+                return False
+            self._work_queue.put(None)
+
+        self._dispatcher.join()
+        for proc in self._processes:
+            proc.join()
+        self._result_queue.put(None)
+        self._collector.join()
+        if self._pending:
+            # Sent to a process which exited normally but didn't answer, ex. `os._exit(0)` during shutdown
+            self._break('a worker process exited without answering')
 
         return False
 
@@ -96,11 +844,158 @@ def callback(res: Any):
 
 
 def main():
-    # Implemented `callback` instead of `Future`
+    # `callback` is called with the result, and `Future` is returned as well
     with Executor() as executor:
+        fs = [executor.submit(sum_of_pow, callback, num) for num in [2, 4, 3, 1]]
+        lprint('Futures: ', [f.result() for f in fs])
+        lprint('Map: ', list(executor.map(pow, range(10), range(10), chunksize=4)))
+
+    # Same API, but CPU-bound work runs in processes
+    with ProcessExecutor(max_worker=4) as executor:
         for num in [2, 4, 3, 1]:
             executor.submit(sum_of_pow, callback, num)
 
 
+def benchmark(n: int = 1_000_000, chunksize: int = 10_000, max_worker: int = 4):
+    """ Run `n` tiny tasks, compared with `concurrent.futures.ThreadPoolExecutor` """
+    def run(name: str, fn: Callable):
+        start = time.perf_counter()
+        total = fn()
+        elapsed = time.perf_counter() - start
+        lprint(f'{name:<36} {elapsed:8.3f}s {n / elapsed:12,.0f} tasks/s (sum={total})')
+
+    def tpe_map():
+        with ThreadPoolExecutor(max_workers=max_worker) as executor:
+            return sum(executor.map(abs, range(n)))
+
+    def exe_submit():
+        with Executor(max_worker) as executor:
+            fs = [executor.submit(abs, None, i) for i in range(n)]
+            return sum(f.result() for f in fs)
+
+    def exe_map():
+        with Executor(max_worker) as executor:
+            return sum(executor.map(abs, range(n), chunksize=chunksize))
+
+    run('ThreadPoolExecutor.map', tpe_map)
+    run('Executor.submit', exe_submit)
+    run(f'Executor.map(chunksize={chunksize})', exe_map)
+
+
+def benchmark_fan_out(depth: int = 6, branch: int = 8, max_worker: int = 16):
+    """ Recursive fan-out: every task submits `branch` children until `depth` """
+    leaves = branch ** depth
+    for work_stealing in (False, True):
+        counter = itertools.count(1)
+        done = threading.Event()
+
+        def node(executor: Executor, level: int):
+            if level == depth:
+                if next(counter) == leaves:
+                    done.set()
+                return
+            for _ in range(branch):
+                executor.submit(node, None, executor, level + 1)
+
+        start = time.perf_counter()
+        with Executor(max_worker, work_stealing=work_stealing) as executor:
+            executor.submit(node, None, executor, 0)
+            done.wait()
+        elapsed = time.perf_counter() - start
+
+        mode = 'work stealing' if work_stealing else 'shared queue'
+        lprint(f'{mode:<16} {elapsed:8.3f}s {leaves / elapsed:12,.0f} leaves/s')
+
+
+def benchmark_priority(n: int = 20_000, max_worker: int = 4):
+    """ Latency-sensitive work(priority 0) submitted behind batch work(priority 1) """
+    with PriorityExecutor(max_worker) as executor:
+        for i in range(n):
+            executor.submit_with_priority(time.sleep, None, 0.0001, priority=1)
+            if i % 10 == 0:
+                executor.submit_with_priority(time.sleep, None, 0, priority=0,
+                                              deadline=time.monotonic() + 0.05)
+
+    for priority, stats in executor.queueing_delay().items():
+        lprint(f'priority={priority} count={stats["count"]:<6} '
+               f'p50={stats["p50"] * 1000:8.3f}ms p99={stats["p99"] * 1000:8.3f}ms '
+               f'expired={stats["expired"]}')
+
+
+def benchmark_elastic(bursts: int = 3, n: int = 200, max_worker: int = 16):
+    """ Watch the pool grow under bursts and shrink while idle """
+    with Executor(max_worker, min_worker=2, idle_timeout=0.2) as executor:
+        for burst in range(bursts):
+            for _ in range(n):
+                executor.submit(time.sleep, None, 0.005)
+            lprint(f'burst {burst} submitted ', executor.counters())
+            time.sleep(0.2)
+            lprint(f'burst {burst} drained   ', executor.counters())
+            time.sleep(0.5)
+            lprint(f'burst {burst} idle      ', executor.counters())
+
+
+def benchmark_async(rate: int = 100_000, seconds: float = 1.0, max_worker: int = 4):
+    """
+    Await `rate` tiny tasks per second, and count event loop wakeups.
+    Compared with `loop.run_in_executor`, which wakes up the loop once per task.
+    """
+    async def lag_monitor(lags: list, stop: asyncio.Event):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def run(name: str, submit: Callable):
+        # Count the wakeups from the other threads
+        loop = asyncio.get_running_loop()
+        wakeups = 0
+        call_soon_threadsafe = loop.call_soon_threadsafe
+
+        def counting(*args, **kwargs):
+            nonlocal wakeups
+            wakeups += 1
+            return call_soon_threadsafe(*args, **kwargs)
+
+        loop.call_soon_threadsafe = counting
+        lags, stop = [], asyncio.Event()
+        monitor = asyncio.create_task(lag_monitor(lags, stop))
+
+        per_tick, tick = rate // 100, 0.01
+        start = time.perf_counter()
+        tasks = []
+        for i in range(int(seconds * 100)):
+            tasks.extend(submit(abs, -j) for j in range(per_tick))
+            await asyncio.sleep(max(0.0, start + (i + 1) * tick - time.perf_counter()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await monitor
+        del loop.call_soon_threadsafe
+        lags.sort()
+        n = len(tasks)
+        lprint(f'{name:<22} {elapsed:7.3f}s {n / elapsed:10,.0f} tasks/s '
+               f'wakeups={wakeups:<8} tasks/wakeup={n / max(wakeups, 1):8.1f} '
+               f'loop lag p50={lags[len(lags) // 2] * 1000:.3f}ms p99={lags[int(len(lags) * 0.99)] * 1000:.3f}ms')
+
+    async def bench():
+        with Executor(max_worker) as executor:
+            await run('Executor.submit_async', executor.submit_async)
+
+        with ThreadPoolExecutor(max_worker) as executor:
+            loop = asyncio.get_running_loop()
+            await run('loop.run_in_executor', lambda fn, *args: loop.run_in_executor(executor, fn, *args))
+
+    asyncio.run(bench())
+
+
 if __name__ == '__main__':
-    main()
+    if 'bench' in sys.argv[1:]:
+        benchmark()
+        benchmark_fan_out()
+        benchmark_priority()
+        benchmark_elastic()
+        benchmark_async()
+    else:
+        main()
@@ -1,36 +1,570 @@
+import multiprocessing
+import queue
+import struct
+import sys
 import time
 import threading
-from typing import Any, Iterable
+from typing import Any, Callable, Dict, Iterable, Iterator, List
 from collections import deque
+from multiprocessing import shared_memory
+
+
+class QueueClosed(Exception):
+    """ Raised by `Queue` operations after `Queue.close` """
 
 
 class Queue:
-    def __init__(self):
+    def __init__(self, capacity: int = 0):
+        """
+        :param capacity: Max number of items. 0 for unbounded.
+        """
+        self.capacity = capacity
         self.mutex = threading.Lock()
-        self.condition = threading.Condition(self.mutex)
+        self.condition = threading.Condition(self.mutex)  # Not empty
+        self.not_full = threading.Condition(self.mutex)
         self.queue = deque()
+        self.closed = False
 
     @property
     def is_empty(self) -> bool:
         return len(self.queue) == 0
 
-    def get(self):
-        """ Dequeue """
+    @property
+    def is_full(self) -> bool:
+        return 0 < self.capacity <= len(self.queue)
+
+    def get(self, timeout: float = None) -> Any:
+        """ Dequeue. Raise `queue.Empty` if nothing is enqueued within `timeout`. """
         with self.condition:
             # If nothing is in the queue, wait (guarded state)
-            while self.is_empty:
-                self.condition.wait()
-            # You can use self.condition.wait_for method instead of while + wait
+            if not self.condition.wait_for(lambda: not self.is_empty or self.closed, timeout):
+                raise queue.Empty
+            if self.closed:
+                raise QueueClosed
 
-        return self.queue.popleft()
+            # Dequeue while holding the lock, otherwise another consumer can take the item first
+            item = self.queue.popleft()
+            if self.capacity:
+                self.not_full.notify()
 
-    def put(self, item: Any):
-        """ Enqueue """
+        return item
+
+    def get_many(self, max_items: int, timeout: float = None) -> List[Any]:
+        """
+        Dequeue up to `max_items` items at once.
+        Wait only for the first item, and return an empty list if nothing is enqueued within `timeout`.
+        """
         with self.condition:
+            if not self.condition.wait_for(lambda: not self.is_empty or self.closed, timeout):
+                return []
+            if self.closed:
+                raise QueueClosed
+
+            items = [self.queue.popleft() for _ in range(min(max_items, len(self.queue)))]
+            if self.capacity:
+                # Wake up as many producers as the freed slots
+                self.not_full.notify(len(items))
+
+        return items
+
+    def put(self, item: Any, timeout: float = None):
+        """ Enqueue. Raise `queue.Full` if no slot is available within `timeout`. """
+        with self.condition:
+            if not self.not_full.wait_for(lambda: not self.is_full or self.closed, timeout):
+                raise queue.Full
+            if self.closed:
+                raise QueueClosed
+
             self.queue.append(item)
             # Wake up thread waiting the condition to be satisfied
             self.condition.notify()
 
+    def put_many(self, items: Iterable[Any], timeout: float = None):
+        """
+        Enqueue all `items`, as many as the free slots at a time.
+        Raise `queue.Full` if no slot is available within `timeout`.
+        """
+        items = list(items)
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while items:
+            with self.condition:
+                remaining = None if end_time is None else end_time - time.monotonic()
+                if not self.not_full.wait_for(lambda: not self.is_full or self.closed, remaining):
+                    raise queue.Full
+                if self.closed:
+                    raise QueueClosed
+
+                n = len(items) if not self.capacity else min(len(items), self.capacity - len(self.queue))
+                self.queue.extend(items[:n])
+                # Wake up as many consumers as the enqueued items
+                self.condition.notify(n)
+
+            items = items[n:]
+
+    def close(self):
+        """ Drop the items, and make the blocked and later operations raise `QueueClosed` """
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify_all()
+            self.not_full.notify_all()
+
+
+class SPSCQueue:
+    """
+    Ring buffer for a single producer and a single consumer.
+    Only the producer moves `_tail` and only the consumer moves `_head`, so no lock
+    is taken while the buffer is neither empty nor full. A waiting side spins briefly,
+    then falls back to waiting on a condition, and flags it so the other side notifies.
+    """
+
+    def __init__(self, slots: int = 1024, spin: int = 100):
+        """
+        :param spin: Number of times to yield before waiting on the condition
+        """
+        self.slots = slots
+        self.spin = spin
+        self._buffer: List[Any] = [None] * slots
+        self._head = 0  # Next slot to get, moved only by the consumer
+        self._tail = 0  # Next slot to put, moved only by the producer
+        self._condition = threading.Condition()
+        self._consumer_waiting = False
+        self._producer_waiting = False
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    def _wait(self, ready, flag: str, timeout: float = None) -> bool:
+        """ Spin, then wait (guarded state) until `ready()` """
+        for _ in range(self.spin):
+            if ready():
+                return True
+            time.sleep(0)  # Yield the GIL to the other side
+
+        with self._condition:
+            setattr(self, flag, True)
+            try:
+                return self._condition.wait_for(ready, timeout)
+            finally:
+                setattr(self, flag, False)
+
+    def _notify(self, flag: str):
+        if getattr(self, flag):
+            with self._condition:
+                self._condition.notify()
+
+    def put(self, item: Any, timeout: float = None):
+        if self._tail - self._head >= self.slots:
+            if not self._wait(lambda: self._tail - self._head < self.slots, '_producer_waiting', timeout):
+                raise queue.Full
+
+        self._buffer[self._tail % self.slots] = item
+        self._tail += 1  # Publish
+        self._notify('_consumer_waiting')
+
+    def put_many(self, items: Iterable[Any], timeout: float = None):
+        """ Publish as many items as the free slots at a time """
+        items = list(items)
+        while items:
+            free = self.slots - (self._tail - self._head)
+            if not free:
+                if not self._wait(lambda: self._tail - self._head < self.slots, '_producer_waiting', timeout):
+                    raise queue.Full
+                continue
+
+            tail = self._tail
+            for i, item in enumerate(items[:free]):
+                self._buffer[(tail + i) % self.slots] = item
+            self._tail = tail + min(free, len(items))  # Publish the batch at once
+            self._notify('_consumer_waiting')
+            items = items[free:]
+
+    def get(self, timeout: float = None) -> Any:
+        if self._tail == self._head:
+            if not self._wait(lambda: self._tail != self._head, '_consumer_waiting', timeout):
+                raise queue.Empty
+
+        index = self._head % self.slots
+        item, self._buffer[index] = self._buffer[index], None
+        self._head += 1  # Release the slot
+        self._notify('_producer_waiting')
+        return item
+
+    def get_many(self, max_items: int, timeout: float = None) -> List[Any]:
+        if self._tail == self._head:
+            if not self._wait(lambda: self._tail != self._head, '_consumer_waiting', timeout):
+                return []
+
+        head = self._head
+        items = []
+        for i in range(min(max_items, self._tail - head)):
+            index = (head + i) % self.slots
+            items.append(self._buffer[index])
+            self._buffer[index] = None
+        self._head = head + len(items)
+        self._notify('_producer_waiting')
+        return items
+
+
+class SharedMemoryQueue:
+    """
+    Guarded suspension across processes.
+    Byte records are copied into a ring buffer in `shared_memory`, instead of being
+    pickled and sent through a pipe. Pass the queue to `multiprocessing.Process` as an argument.
+
+    Layout: head(8 bytes) | tail(8 bytes) | waiting getters(4 bytes) | waiting putters(4 bytes) | ring buffer
+    Each record is prefixed with its length(4 bytes), unless `record_size` is fixed.
+    """
+    _HEADER = struct.Struct('QQII')
+    _LENGTH = struct.Struct('I')
+
+    def __init__(self, size: int = 1 << 20, record_size: int = None):
+        """
+        :param size: Bytes of the ring buffer
+        :param record_size: Fixed size of every record. None for length-prefixed records.
+        """
+        self.capacity = size
+        self.record_size = record_size
+        self.shm = shared_memory.SharedMemory(create=True, size=self._HEADER.size + size)
+        self._HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0)
+        self.mutex = multiprocessing.Lock()
+        self.condition = multiprocessing.Condition(self.mutex)  # Not empty
+        self.not_full = multiprocessing.Condition(self.mutex)
+
+    def _header(self) -> tuple:
+        return self._HEADER.unpack_from(self.shm.buf, 0)
+
+    def _used(self) -> int:
+        head, tail, _, _ = self._header()
+        return tail - head
+
+    def _wait_for(self, condition: multiprocessing.Condition, predicate, field: int, timeout: float) -> bool:
+        """ Wait (guarded state), counting the waiters in the header so that the other side notifies only if needed """
+        if predicate():
+            return True
+
+        offset = 16 + 4 * field
+        count = struct.unpack_from('I', self.shm.buf, offset)[0]
+        struct.pack_into('I', self.shm.buf, offset, count + 1)
+        try:
+            return condition.wait_for(predicate, timeout)
+        finally:
+            count = struct.unpack_from('I', self.shm.buf, offset)[0]
+            struct.pack_into('I', self.shm.buf, offset, count - 1)
+
+    def _record_bytes(self, data: bytes) -> int:
+        if self.record_size is not None:
+            if len(data) != self.record_size:
+                raise ValueError(f'record must be {self.record_size} bytes')
+            return self.record_size
+        return self._LENGTH.size + len(data)
+
+    def _copy_in(self, position: int, data: bytes):
+        start = self._HEADER.size + position % self.capacity
+        first = min(len(data), self._HEADER.size + self.capacity - start)
+        self.shm.buf[start:start + first] = data[:first]
+        if first < len(data):
+            # Wrap around
+            self.shm.buf[self._HEADER.size:self._HEADER.size + len(data) - first] = data[first:]
+
+    def _copy_out(self, position: int, size: int) -> bytes:
+        start = self._HEADER.size + position % self.capacity
+        first = min(size, self._HEADER.size + self.capacity - start)
+        data = bytes(self.shm.buf[start:start + first])
+        if first < size:
+            data += bytes(self.shm.buf[self._HEADER.size:self._HEADER.size + size - first])
+        return data
+
+    def put(self, data: bytes, timeout: float = None):
+        """ Enqueue. Raise `queue.Full` if there is no room for `data` within `timeout`. """
+        self.put_many([data], timeout)
+
+    def put_many(self, records: Iterable[bytes], timeout: float = None):
+        """
+        Enqueue all `records`, as many as fit at a time.
+        Raise `queue.Full` if there is no room within `timeout`.
+        """
+        records = [(data, self._record_bytes(data)) for data in records]
+        if any(needed > self.capacity for _, needed in records):
+            raise ValueError('record is larger than the queue')
+
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while records:
+            with self.mutex:
+                # If there is no room, wait (guarded state)
+                remaining = None if end_time is None else end_time - time.monotonic()
+                needed = records[0][1]
+                if not self._wait_for(self.not_full, lambda: self.capacity - self._used() >= needed, 1, remaining):
+                    raise queue.Full
+
+                head, tail, getters, _ = self._header()
+                count = 0
+                for data, needed in records:
+                    if self.capacity - (tail - head) < needed:
+                        break
+                    if self.record_size is None:
+                        self._copy_in(tail, self._LENGTH.pack(len(data)))
+                        self._copy_in(tail + self._LENGTH.size, data)
+                    else:
+                        self._copy_in(tail, data)
+                    tail += needed
+                    count += 1
+
+                # Publish the records at once
+                struct.pack_into('Q', self.shm.buf, 8, tail)
+                if getters:
+                    self.condition.notify(min(count, getters))
+
+            records = records[count:]
+
+    def get(self, timeout: float = None) -> bytes:
+        """ Dequeue. Raise `queue.Empty` if nothing is enqueued within `timeout`. """
+        records = self.get_many(1, timeout)
+        if not records:
+            raise queue.Empty
+        return records[0]
+
+    def get_many(self, max_items: int, timeout: float = None) -> List[bytes]:
+        """
+        Dequeue up to `max_items` records at once.
+        Wait only for the first record, and return an empty list if nothing is enqueued within `timeout`.
+        """
+        with self.mutex:
+            if not self._wait_for(self.condition, lambda: self._used() > 0, 0, timeout):
+                return []
+
+            head, tail, _, putters = self._header()
+            records = []
+            while head != tail and len(records) < max_items:
+                if self.record_size is None:
+                    size = self._LENGTH.unpack(self._copy_out(head, self._LENGTH.size))[0]
+                    records.append(self._copy_out(head + self._LENGTH.size, size))
+                    head += self._LENGTH.size + size
+                else:
+                    records.append(self._copy_out(head, self.record_size))
+                    head += self.record_size
+
+            struct.pack_into('Q', self.shm.buf, 0, head)
+            if putters:
+                # The freed room may fit more than one waiting record
+                self.not_full.notify_all()
+
+        return records
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        """ Called once by the process which created the queue """
+        self.shm.unlink()
+
+
+_END = object()  # End of stream
+
+
+class _Failure:
+    """ Exception raised by a stage, passed downstream instead of the item """
+
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+class Stage:
+    """ Workers calling `fn` on every item of the bounded queue in front of the stage """
+
+    def __init__(self, fn: Callable[[Any], Any], workers: int = 1, queue_size: int = 64,
+                 batch: int = 1, name: str = None):
+        """
+        :param queue_size: Capacity of the queue in front of this stage
+        :param batch: Max number of items taken from and handed to the queues at once
+        """
+        self.fn = fn
+        self.workers = workers
+        self.batch = batch
+        self.name = name or getattr(fn, '__name__', 'stage')
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Clear the per-run state """
+        with self.lock:
+            self.processed = 0
+            self.busy = 0.0  # Seconds spent in `fn`
+            self.occupancy = 0.0  # Sum of input queue occupancy sampled at each take
+            self.samples = 0
+
+    def work(self, inbox: Queue, output: Queue, downstream_workers: int, finished: List[int]):
+        """
+        :param finished: Single-item list counting the workers which reached the end of stream in this run
+        """
+        try:
+            self._work(inbox, output, downstream_workers, finished)
+        except QueueClosed:
+            pass  # Run cancelled
+
+    def _work(self, inbox: Queue, output: Queue, downstream_workers: int, finished: List[int]):
+        while True:
+            items = inbox.get_many(self.batch)
+            # Unbounded queue is never full
+            occupancy = len(inbox.queue) / inbox.capacity if inbox.capacity else 0.0
+
+            ends = items.count(_END)
+            end = ends > 0
+            if end:
+                items = [item for item in items if item is not _END]
+                # Give back the end of stream of the other workers
+                inbox.put_many([_END] * (ends - 1))
+
+            start = time.perf_counter()
+            results = []
+            for seq, item in items:
+                if not isinstance(item, _Failure):
+                    try:
+                        item = self.fn(item)
+                    except Exception as exc:
+                        item = _Failure(exc)
+                results.append((seq, item))
+            busy = time.perf_counter() - start
+
+            with self.lock:
+                self.processed += len(items)
+                self.busy += busy
+                self.occupancy += occupancy
+                self.samples += 1
+            if results:
+                output.put_many(results)
+
+            if end:
+                with self.lock:
+                    finished[0] += 1
+                    last = finished[0] == self.workers
+                # The last worker passes the end of stream downstream
+                if last:
+                    output.put_many([_END] * downstream_workers)
+                return
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'name': self.name,
+                'workers': self.workers,
+                'processed': self.processed,
+                'throughput': self.processed / elapsed if elapsed else 0.0,
+                'utilization': self.busy / (self.workers * elapsed) if elapsed else 0.0,
+                'occupancy': self.occupancy / self.samples if self.samples else 0.0,
+            }
+
+
+class Pipeline:
+    """
+    Producer/consumer stages connected by bounded queues.
+
+        pipeline = Pipeline().stage(parse, workers=2).stage(transform, workers=4, batch=16)
+        for result in pipeline.run(items):
+            ...
+
+    The stage with the highest utilization and a full input queue is the bottleneck.
+    Each run has its own queues. Closing the results before the end cancels the run.
+    Stats are of the last run.
+    """
+
+    def __init__(self, ordered: bool = True, output_size: int = 1024):
+        """
+        :param ordered: If True, results are yielded in the order of the input
+        """
+        self.ordered = ordered
+        self.output_size = output_size
+        self.stages: List[Stage] = []
+        self.started = None
+        self.finished = None
+
+    def stage(self, fn: Callable[[Any], Any], workers: int = 1, queue_size: int = 64,
+              batch: int = 1, name: str = None) -> 'Pipeline':
+        self.stages.append(Stage(fn, workers, queue_size, batch, name))
+        return self
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        if not self.stages:
+            raise ValueError('pipeline has no stage')
+
+        # Queue in front of each stage, and the output
+        queues = [Queue(stage.queue_size) for stage in self.stages] + [Queue(self.output_size)]
+        first = self.stages[0]
+
+        def feed():
+            batch = []
+            seq = 0
+            try:
+                try:
+                    for item in items:
+                        batch.append((seq, item))
+                        seq += 1
+                        if len(batch) >= first.batch:
+                            queues[0].put_many(batch)
+                            batch = []
+                except Exception as exc:
+                    # Raised at its position in the results, then the results end
+                    batch.append((seq, _Failure(exc)))
+                queues[0].put_many(batch + [_END] * first.workers)
+            except QueueClosed:
+                pass  # Run cancelled
+
+        for stage in self.stages:
+            stage.reset()
+        self.started = time.perf_counter()
+        self.finished = None
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for i, stage in enumerate(self.stages):
+            downstream_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            finished = [0]
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=stage.work, daemon=True,
+                    args=(queues[i], queues[i + 1], downstream_workers, finished),
+                ))
+        for thr in threads:
+            thr.start()
+
+        return self._results(queues)
+
+    def _results(self, queues: List[Queue]) -> Iterator[Any]:
+        output = queues[-1]
+        pending = {}  # Results arrived ahead of their turn
+        next_seq = 0
+        try:
+            while True:
+                for result in output.get_many(self.output_size):
+                    if result is _END:
+                        self.finished = time.perf_counter()
+                        return
+
+                    if not self.ordered:
+                        yield self._unwrap(result[1])
+                        continue
+
+                    pending[result[0]] = result[1]
+                    while next_seq in pending:
+                        yield self._unwrap(pending.pop(next_seq))
+                        next_seq += 1
+        finally:
+            if self.finished is None:
+                # Closed or failed before the end: let the feeder and the workers exit
+                self.finished = time.perf_counter()
+                for q in queues:
+                    q.close()
+
+    @staticmethod
+    def _unwrap(item: Any) -> Any:
+        if isinstance(item, _Failure):
+            raise item.exception
+        return item
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """ Per-stage throughput(items/s), utilization of the workers and average input queue occupancy """
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+        return [stage.stats(elapsed) for stage in self.stages]
+
 
 def lprint(*args: Iterable):
     """ Synchronized print """
@@ -67,5 +601,188 @@ def main():
     producer_thr.start()
 
 
+def benchmark(n: int = 200_000, batch: int = 64):
+    """ Items/s with 1, 4 and 16 producers and consumers """
+    def run_queue(q, put, get):
+        def produce(count: int):
+            for i in range(count):
+                put(q, i)
+
+        def consume():
+            while get(q) is not None:
+                pass
+
+        return produce, consume
+
+    def deque_get(q: deque):
+        # `deque` can't block, so poll it
+        while True:
+            try:
+                return q.popleft()
+            except IndexError:
+                time.sleep(0)
+
+    def batch_put(q: Queue, count: int):
+        for start in range(0, count, batch):
+            q.put_many(range(start, min(start + batch, count)))
+
+    def batch_get(q: Queue):
+        while True:
+            sentinels = q.get_many(batch).count(None)
+            if sentinels:
+                # Give back the sentinels of the other consumers
+                q.put_many([None] * (sentinels - 1))
+                return
+
+    cases = {
+        'Queue.put/get': (lambda: Queue(1024), Queue.put, Queue.get),
+        'Queue.put_many/get_many': (lambda: Queue(1024), None, None),
+        'queue.Queue': (lambda: queue.Queue(1024), queue.Queue.put, queue.Queue.get),
+        'collections.deque': (deque, deque.append, deque_get),
+    }
+    for workers in (1, 4, 16):
+        for name, (factory, put, get) in cases.items():
+            q = factory()
+            if put is None:
+                produce, consume = (lambda count: batch_put(q, count)), (lambda: batch_get(q))
+            else:
+                produce, consume = run_queue(q, put, get)
+
+            consumers = [threading.Thread(target=consume) for _ in range(workers)]
+            producers = [threading.Thread(target=produce, args=(n // workers,)) for _ in range(workers)]
+            start = time.perf_counter()
+            for thr in consumers + producers:
+                thr.start()
+            for thr in producers:
+                thr.join()
+            for _ in consumers:
+                # One sentinel per consumer
+                q.put(None) if isinstance(q, (Queue, queue.Queue)) else q.append(None)
+            for thr in consumers:
+                thr.join()
+            elapsed = time.perf_counter() - start
+
+            lprint(f'producers=consumers={workers:<3} {name:<24} {n / elapsed:12,.0f} items/s')
+
+
+def benchmark_spsc(n: int = 200_000, batch: int = 64):
+    """ Items/s and latency from put to get, with a single producer and a single consumer """
+    cases = {
+        'Queue.put/get': (lambda: Queue(1024), False),
+        'SPSCQueue.put/get': (lambda: SPSCQueue(1024), False),
+        'Queue.put_many/get_many': (lambda: Queue(1024), True),
+        'SPSCQueue.put_many/get_many': (lambda: SPSCQueue(1024), True),
+    }
+    for name, (factory, batched) in cases.items():
+        q = factory()
+        latencies = []
+
+        def produce():
+            if batched:
+                for _ in range(0, n, batch):
+                    now = time.perf_counter()
+                    q.put_many([now] * batch)
+            else:
+                for _ in range(n):
+                    q.put(time.perf_counter())
+            q.put(None)
+
+        def consume():
+            while True:
+                items = q.get_many(batch) if batched else [q.get()]
+                now = time.perf_counter()
+                for sent in items:
+                    if sent is None:
+                        return
+                    latencies.append(now - sent)
+
+        threads = [threading.Thread(target=consume), threading.Thread(target=produce)]
+        start = time.perf_counter()
+        for thr in threads:
+            thr.start()
+        for thr in threads:
+            thr.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p50, p99, p999 = (latencies[int(len(latencies) * p)] * 1e6 for p in (0.5, 0.99, 0.999))
+        lprint(f'{name:<28} {len(latencies) / elapsed:12,.0f} items/s '
+               f'latency p50={p50:9.1f}us p99={p99:9.1f}us p99.9={p999:9.1f}us')
+
+
+def _shm_producer(q: Any, n: int, record: bytes, batch: int):
+    if batch > 1:
+        for _ in range(0, n, batch):
+            q.put_many([record] * batch)
+    else:
+        for _ in range(n):
+            q.put(record)
+    q.put(b'')  # End of stream
+
+
+def benchmark_shm(n: int = 100_000, batch: int = 64):
+    """ Records/s from a producer process, compared with `multiprocessing.Queue` """
+    cases = {
+        'SharedMemoryQueue.put/get': (SharedMemoryQueue, 1),
+        'SharedMemoryQueue.put_many/get_many': (SharedMemoryQueue, batch),
+        'multiprocessing.Queue': (multiprocessing.Queue, 1),
+    }
+    for record_size in (64, 4096):
+        record = bytes(record_size)
+        for name, (factory, size) in cases.items():
+            q = factory()
+            proc = multiprocessing.Process(target=_shm_producer, args=(q, n, record, size))
+
+            start = time.perf_counter()
+            proc.start()
+            count, done = 0, False
+            while not done:
+                records = q.get_many(size) if size > 1 else [q.get()]
+                done = b'' in records
+                count += len(records) - done
+            elapsed = time.perf_counter() - start
+            proc.join()
+            if isinstance(q, SharedMemoryQueue):
+                q.close()
+                q.unlink()
+
+            lprint(f'{name:<36} record={record_size:<5} {count / elapsed:12,.0f} records/s '
+                   f'{count * record_size / elapsed / 1024 / 1024:10,.1f} MiB/s')
+
+
+def benchmark_pipeline(n: int = 2_000):
+    """ Find the bottleneck stage of a pipeline """
+    def parse(i: int) -> int:
+        return i * 2
+
+    def fetch(i: int) -> int:
+        time.sleep(0.002)  # I/O bound
+        return i + 1
+
+    def render(i: int) -> str:
+        return str(i)
+
+    for ordered in (True, False):
+        pipeline = (Pipeline(ordered=ordered)
+                    .stage(parse, workers=1, batch=32)
+                    .stage(fetch, workers=8, queue_size=256)
+                    .stage(render, workers=2, batch=32))
+        start = time.perf_counter()
+        results = list(pipeline.run(range(n)))
+        elapsed = time.perf_counter() - start
+        assert sorted(results, key=int) == [str(i * 2 + 1) for i in range(n)]
+
+        lprint(f'ordered={ordered} {n / elapsed:10,.0f} items/s')
+        for stats in pipeline.stats():
+            lprint(f'  {stats["name"]:<8} workers={stats["workers"]:<3} {stats["throughput"]:10,.0f} items/s '
+                   f'utilization={stats["utilization"]:6.1%} occupancy={stats["occupancy"]:6.1%}')
+
+
 if __name__ == '__main__':
-    main()
+    if 'bench' in sys.argv[1:]:
+        benchmark()
+        benchmark_spsc()
+        benchmark_shm()
+        benchmark_pipeline()
+    else:
+        main()
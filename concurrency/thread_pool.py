@@ -1 +1,203 @@
-""" Same implementation with `event_based_asynchronous.py """
+""" Thread pool with a bounded submission queue, so that a fast producer can't grow memory without limit """
+
+import queue
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from concurrent.futures import Future
+from enum import Enum
+from typing import Callable, Dict
+
+
+class RejectPolicy(Enum):
+    """ What to do when the submission queue is full """
+    BLOCK = 1  # Wait until a slot is available
+    ABORT = 2  # Raise `QueueFull`
+    CALLER_RUNS = 3  # Run the task in the caller's thread, which also slows down the producer
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Task:
+    __slots__ = ('future', 'fn', 'args', 'kwargs')
+
+    def __init__(self, future: Future, fn: Callable, args: tuple, kwargs: dict):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            res = self.fn(*self.args, **self.kwargs)
+        except BaseException as exc:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(res)
+
+
+class ThreadPool:
+    def __init__(self, max_worker: int = 4, queue_size: int = 64,
+                 policy: RejectPolicy = RejectPolicy.BLOCK):
+        """
+        :param queue_size: Max number of tasks waiting for a worker. 0 for unbounded.
+        :param policy: What to do when the queue is full
+        """
+        self.policy = policy
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._drained = False  # Set by the last worker to exit
+        self._alive = max_worker
+        self._stats = Counter()
+        self._threads = [threading.Thread(target=self._worker, name=f'[Thread-Pool({i})]')
+                         for i in range(max_worker)]
+        for thr in self._threads:
+            thr.start()
+
+    def submit(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Future:
+        """
+        :param timeout: Seconds to wait for a slot with `RejectPolicy.BLOCK`,
+            after which `QueueFull` is raised. None to wait forever.
+        """
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new tasks after shutdown')
+
+        task = _Task(Future(), fn, args, kwargs)
+        try:
+            if self.policy == RejectPolicy.BLOCK:
+                self._queue.put(task, block=True, timeout=timeout)
+            else:
+                self._queue.put_nowait(task)
+        except queue.Full:
+            if self.policy != RejectPolicy.CALLER_RUNS:
+                self._count('rejected')
+                raise QueueFull() from None
+            self._count('caller_runs')
+            task.run()
+            return task.future
+
+        if self._drained:
+            # Racing `shutdown`, the task landed after the workers exited.
+            # Otherwise the last worker has not drained yet, and it will cancel the task.
+            with self._lock:
+                self._cancel_pending()
+        self._count('submitted')
+        return task.future
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            task.run()
+
+        with self._lock:
+            self._alive -= 1
+            if self._alive == 0:
+                self._drained = True
+                self._cancel_pending()
+
+    def _cancel_pending(self):
+        """ Called with `_lock`. Cancel the tasks queued after the sentinels. """
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if task is not None:
+                task.future.cancel()
+                # Wake up `concurrent.futures.wait` too, which `cancel` alone doesn't
+                task.future.set_running_or_notify_cancel()
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {'queued': self._queue.qsize(), **self._stats}
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+
+        if not wait:
+            # Sentinels may block on a full queue, so queue them in the background
+            threading.Thread(target=self._stop_workers, daemon=True).start()
+            return
+
+        self._stop_workers()
+        for thr in self._threads:
+            thr.join()
+
+    def _stop_workers(self):
+        # Sentinels are queued after the pending tasks
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        return False
+
+
+def task(i: int) -> int:
+    time.sleep(0.01)
+    return i ** 2
+
+
+def main():
+    with ThreadPool(max_worker=2, queue_size=2, policy=RejectPolicy.ABORT) as pool:
+        fs = []
+        for i in range(10):
+            try:
+                fs.append(pool.submit(task, i))
+            except QueueFull:
+                print(f'Task {i} rejected')
+
+        print('Results:', [f.result() for f in fs])
+        print('Counters:', pool.counters())
+
+
+def benchmark(n: int = 20_000, max_worker: int = 4, queue_size: int = 1024):
+    """ Overload: the producer submits faster than the workers can run """
+    def work(payload: bytes) -> int:
+        time.sleep(0.001)
+        return len(payload)
+
+    cases = [('unbounded', 0, RejectPolicy.BLOCK)] + [
+        (policy.name.lower(), queue_size, policy) for policy in RejectPolicy
+    ]
+    for name, size, policy in cases:
+        tracemalloc.start()
+        start = time.perf_counter()
+        with ThreadPool(max_worker, size, policy) as pool:
+            for _ in range(n):
+                try:
+                    pool.submit(work, bytes(1024))
+                except QueueFull:
+                    pass
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        counters = pool.counters()
+        done = counters.get('submitted', 0) + counters.get('caller_runs', 0)
+        print(f'{name:<12} {elapsed:7.3f}s {done / elapsed:10,.0f} tasks/s '
+              f'peak={peak / 1024 / 1024:7.2f}MiB {counters}')
+
+
+if __name__ == '__main__':
+    benchmark() if 'bench' in sys.argv[1:] else main()
@@ -1,6 +1,11 @@
+import itertools
+import sys
 import time
 import threading
+import weakref
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
 
 
 def lprint(*args):
@@ -25,6 +30,82 @@ def use_thread_local(i):
         time.sleep(0.5)
 
 
+class _SlotOwner:
+    """ Lives in the thread-local storage, so it dies with its thread """
+    __slots__ = ('__weakref__',)
+
+
+class _Slots:
+    """ Slots of a `ShardedCounter`, apart from it so that the finalizers of the threads don't keep it alive """
+
+    def __init__(self):
+        self.live: Dict[int, List[int]] = {}  # One single-item list per live thread
+        self.base = 0  # Counts of the finished threads
+        self.lock = threading.Lock()  # Only to register and retire a slot, and to read
+
+    def retire(self, key: int):
+        """ Called once the owner thread has finished, so nobody writes to the slot any more """
+        with self.lock:
+            self.base += self.live.pop(key)[0]
+
+
+class ShardedCounter:
+    """
+    Counter where each thread adds to its own slot without locking, and readers merge the slots.
+    When a thread finishes, its slot is folded into a base total, so thread churn doesn't grow the slots.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._slots = _Slots()
+        self._keys = itertools.count()
+
+    def _slot(self) -> List[int]:
+        try:
+            return self._local.slot
+        except AttributeError:
+            slot = self._local.slot = [0]
+            owner = self._local.owner = _SlotOwner()
+            key = next(self._keys)
+            with self._slots.lock:
+                self._slots.live[key] = slot
+            weakref.finalize(owner, self._slots.retire, key)
+            return slot
+
+    def add(self, n: int = 1):
+        # Only the owner thread writes to its slot
+        self._slot()[0] += n
+
+    @property
+    def value(self) -> int:
+        slots = self._slots
+        with slots.lock:
+            return slots.base + sum(slot[0] for slot in slots.live.values())
+
+
+class ScratchBufferPool:
+    """ Reusable scratch buffers per thread, instead of allocating a new `bytearray` for every use """
+
+    def __init__(self, min_size: int = 4096):
+        self.min_size = min_size
+        self._local = threading.local()
+
+    @contextmanager
+    def borrow(self, size: int) -> Iterator[memoryview]:
+        """ Borrow a buffer of `size` bytes. Nested borrows get different buffers. """
+        free: List[bytearray] = self._local.__dict__.setdefault('free', [])
+        buffer = free.pop() if free else bytearray(self.min_size)
+        if len(buffer) < size:
+            buffer = bytearray(max(size, len(buffer) * 2))
+
+        view = memoryview(buffer)[:size]
+        try:
+            yield view
+        finally:
+            view.release()
+            free.append(buffer)
+
+
 def main():
     fs = []
     with ThreadPoolExecutor() as executor:
@@ -34,6 +115,46 @@ def main():
     for f in fs:
         f.result()
 
+    counter, pool = ShardedCounter(), ScratchBufferPool()
+
+    def work(i: int):
+        with pool.borrow(16) as buffer:
+            buffer[:] = bytes([i]) * 16
+            counter.add(sum(buffer))
+
+    with ThreadPoolExecutor() as executor:
+        executor.map(work, range(10))
+    lprint('Sharded counter:', counter.value)
+
+
+class LockedCounter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+
+def benchmark(n: int = 1_000_000):
+    """ Increments/s with 1 to 32 threads """
+    for threads in (1, 2, 4, 8, 16, 32):
+        for counter in (LockedCounter(), ShardedCounter()):
+            def increment(count: int):
+                add = counter.add
+                for _ in range(count):
+                    add()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                for _ in range(threads):
+                    executor.submit(increment, n // threads)
+            elapsed = time.perf_counter() - start
+
+            assert counter.value == n // threads * threads
+            lprint(f'threads={threads:<3} {type(counter).__name__:<15} {n / elapsed:12,.0f} increments/s')
+
 
 if __name__ == '__main__':
-    main()
+    benchmark() if 'bench' in sys.argv[1:] else main()
@@ -1,16 +1,105 @@
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class Registry:
+    """
+    Thread-safe map of key to instance, which creates each instance only once.
+    Existing keys are looked up without any lock. Creation takes a lock stripe chosen by
+    the key, so creating instances of different keys doesn't serialize.
+
+    `weak` keeps an instance only while it is referenced elsewhere. Otherwise `max_size` caps
+    the number of instances, evicting the least recently used one (second chance approximation,
+    so that hits don't need a lock) and calling its `close` if it has one.
+    """
+
+    def __init__(self, stripes: int = 16, weak: bool = False, max_size: Optional[int] = None):
+        if weak and max_size is not None:
+            raise ValueError('weak entries cannot be capped by max_size')
+
+        self.max_size = max_size
+        self._entries: Dict[Hashable, Any] = weakref.WeakValueDictionary() if weak else {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._lock = threading.Lock()  # Guards the mutations of `_entries` and `_order`
+        self._order = deque()  # Keys in insertion order, for eviction
+        self._referenced: Dict[Hashable, bool] = {}  # Set on a hit, without lock
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """ Instance of `key`, created with `factory` if not exists """
+        instance = self._entries.get(key)  # Lock-free fast path
+        if instance is not None:
+            if self.max_size is not None and self._referenced.get(key) is False:
+                self._referenced[key] = True
+            return instance
+
+        with self._stripes[hash(key) % len(self._stripes)]:
+            instance = self._entries.get(key)
+            if instance is not None:
+                return instance
+
+            instance = factory()
+            with self._lock:
+                self._entries[key] = instance
+                evicted = self._evict(key) if self.max_size is not None else []
+
+        # Close outside the locks, since it may be slow
+        for old in evicted:
+            close = getattr(old, 'close', None)
+            if close is not None:
+                close()
+        return instance
+
+    def _evict(self, key: Hashable) -> List[Any]:
+        """ Called with `_lock` after `key` is inserted. `key` itself is never evicted. """
+        evicted = []
+        while len(self._entries) > self.max_size and self._order:
+            old = self._order.popleft()
+            if self._referenced.get(old):
+                # Used since the last sweep, so give it a second chance
+                self._referenced[old] = False
+                self._order.append(old)
+                continue
+            self._referenced.pop(old, None)
+            evicted.append(self._entries.pop(old))
+
+        self._order.append(key)
+        self._referenced[key] = False
+        if len(self._referenced) > 2 * self.max_size:
+            # A hit racing an eviction may re-add the flag of an evicted key. Drop such strays.
+            self._referenced = {k: v for k, v in self._referenced.items() if k in self._entries}
+        return evicted
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return repr(dict(self._entries.items()))
+
+
 class DataBase:
-    REGISTRY = {}
+    REGISTRY = Registry()  # Unbounded. `Registry(max_size=...)` would close and forget the least used ones.
 
     def __new__(cls, type_):
         """
         Instantiate the multiton class when `type_` has never been used to
         created and return the object.
         """
-        # Thread-safe operations required (ex. lock)
-        if type_ not in cls.REGISTRY.keys():
-            cls.REGISTRY[type_] = object.__new__(cls)
+        return cls.REGISTRY.get(type_, lambda: cls._create(type_))
 
-        return cls.REGISTRY[type_]
+    @classmethod
+    def _create(cls, type_) -> 'DataBase':
+        instance = object.__new__(cls)
+        instance.type_ = type_
+        instance.connect()
+        return instance
 
     def connect(self):
         pass
@@ -18,12 +107,60 @@ class DataBase:
     def query(self):
         pass
 
+    def close(self):
+        """ Called when evicted from a capped `REGISTRY` """
+        pass
+
+
+class LockedRegistry:
+    """ Takes one global lock on every lookup """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = factory()
+            return self._entries[key]
+
 
 def main():
     mysql = DataBase('mysql')
     postgresql = DataBase('postgresql')
+    assert mysql is DataBase('mysql')
     print(DataBase.REGISTRY)  # {'mysql': <...>, 'postgresql': <...>'}
 
 
+def benchmark(threads: int = 16, keys: int = 256, n: int = 200_000, connect_time: float = 0.005):
+    """ Creating `keys` instances that take `connect_time` each, then looking them up from `threads` threads """
+    def connect():
+        time.sleep(connect_time)
+        return object()
+
+    for registry in (LockedRegistry(), Registry(), Registry(max_size=keys // 2)):
+        name = type(registry).__name__ + (f'(max_size={registry.max_size})' if getattr(registry, 'max_size', None) else '')
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(lambda key: registry.get(key, connect), range(keys)))
+        create = time.perf_counter() - start
+
+        def lookup(count: int):
+            # A few hot keys, which are still cached in the capped registry
+            get = registry.get
+            for i in range(count):
+                get(keys - 1 - i % 8, connect)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in range(threads):
+                executor.submit(lookup, n // threads)
+        hit = time.perf_counter() - start
+
+        print(f'{name:<25} create: {keys / create:8,.0f} keys/s  lookup: {n / hit:12,.0f} hits/s')
+
+
 if __name__ == '__main__':
-    main()
+    benchmark() if 'bench' in sys.argv[1:] else main()
@@ -1,7 +1,76 @@
+import os
+import sys
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 
-class Logger:
+class SingletonMeta(type):
+    """
+    Reusable singleton metaclass.
+    Once the instance exists, it is returned without any lock. Only the first
+    construction takes a lock, and each class has its own lock.
+    """
+
+    def __init__(cls, name: str, bases: tuple, namespace: dict):
+        super().__init__(name, bases, namespace)
+        cls._instance = None
+        cls._lock = threading.Lock()
+
+    def __call__(cls, *args, **kwargs):
+        instance = cls._instance  # Lock-free fast path
+        if instance is None:
+            with cls._lock:  # Prevent simultaneous instantiation in a multi threaded environment.
+                if cls._instance is None:
+                    cls._instance = super().__call__(*args, **kwargs)
+                instance = cls._instance
+
+        return instance
+
+
+class locked_cached_property:
+    """
+    Thread-safe lazy attribute, computed only once even if several threads access it at first.
+    The value is cached in the instance `__dict__`, which takes precedence over this
+    (non-data) descriptor, so later accesses don't reach here at all.
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+        self.name = func.__name__
+        self.lock = threading.Lock()
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+
+    def __get__(self, instance: Any, owner: type = None) -> Any:
+        if instance is None:
+            return self
+
+        with self.lock:
+            cache = instance.__dict__
+            if self.name not in cache:
+                cache[self.name] = self.func(instance)
+            return cache[self.name]
+
+
+class Logger(metaclass=SingletonMeta):
+    @locked_cached_property
+    def stream(self):
+        """
+        Stand-in for opening a log file, only to demonstrate `locked_cached_property`.
+        The `sys.stdout` of the first log is kept, even if it is replaced later.
+        """
+        return sys.stdout
+
+    def log(self, *args):
+        print(*args, file=self.stream)
+
+
+class LockedLogger:
+    """ Takes `_lock` on every instantiation, even after the instance exists """
     _instance = None
     _lock = threading.Lock()
 
@@ -20,7 +89,39 @@ class Logger:
 def main():
     log = Logger()
     log.log('text')
+    assert log is Logger()
+
+
+def benchmark(n: int = 1_000_000, threads: int = 8):
+    """ Cost of acquiring the instance once it exists """
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'concurrency'))
+    import double_checked_locking
+
+    classes = {
+        'LockedLogger': LockedLogger,
+        'double_checked_locking.Logger': double_checked_locking.Logger,
+        'SingletonMeta Logger': Logger,
+    }
+    for name, cls in classes.items():
+        cls()
+
+        def acquire(count: int):
+            for _ in range(count):
+                cls()
+
+        start = time.perf_counter()
+        acquire(n)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in range(threads):
+                executor.submit(acquire, n // threads)
+        multi = time.perf_counter() - start
+
+        print(f'{name:<30} 1 thread: {single / n * 1e9:6.1f}ns/call  '
+              f'{threads} threads: {multi / n * 1e9:6.1f}ns/call')
 
 
 if __name__ == '__main__':
-    main()
+    benchmark() if 'bench' in sys.argv[1:] else main()
@@ -1,15 +1,19 @@
+import asyncio
 import random
+import sys
 import time
 import threading
-import queue
-
-from typing import Union
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
 
 
 class Connection:
     def __init__(self):
         # establish connection, and so on.
-        pass
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.closed = False
 
     def clear(self, *args):
         """ clear self instance for next usage """
@@ -18,35 +22,688 @@ class Connection:
         """ execute query """
         time.sleep(random.randint(0, 2))
 
+    def is_valid(self) -> bool:
+        """ ping the server """
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionBudget:
+    """
+    Cap of the open connections shared by several pools.
+    When it runs out, idle connections of the least recently released pool are closed for the pool in need.
+    """
+
+    def __init__(self, max_total: int):
+        self.max_total = max_total
+        self.used = 0
+        self._condition = threading.Condition()
+        # Pools which may have idle connections, least recently released first
+        self._idle_pools: 'OrderedDict[ConnectionPool, None]' = OrderedDict()
+
+    def try_reserve(self) -> bool:
+        with self._condition:
+            if self.used >= self.max_total:
+                return False
+            self.used += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.used -= 1
+            self._condition.notify()
+
+    def wait(self, timeout: Optional[float]):
+        with self._condition:
+            self._condition.wait_for(lambda: self.used < self.max_total, timeout)
+
+    def released(self, pool: 'ConnectionPool'):
+        """ Called when `pool` gets an idle connection """
+        with self._condition:
+            self._idle_pools[pool] = None
+            self._idle_pools.move_to_end(pool)
+
+    def reclaim(self, requester: 'ConnectionPool') -> bool:
+        """ Close an idle connection of the least recently released pool. Return whether any was closed. """
+        while True:
+            with self._condition:
+                pool = next((pool for pool in self._idle_pools if pool is not requester), None)
+                if pool is None:
+                    return False
+                # Pools without idle connections are dropped here, until they release one again
+                del self._idle_pools[pool]
+
+            if pool.evict_idle(1):
+                with self._condition:
+                    if pool not in self._idle_pools:
+                        # It may have more idle connections, and is still the least recently released
+                        self._idle_pools[pool] = None
+                        self._idle_pools.move_to_end(pool, last=False)
+                return True
+
 
 class ConnectionPool:
-    POOL = queue.Queue()
+    """
+    Pool which opens at most `max_size` connections.
+    Idle connections are reused most recently used first, so that the rest stay idle long enough to be evicted.
+    """
 
-    def __init__(self):
-        self._connection: Union[Connection, None] = None
+    def __init__(self, factory: Callable[[], Connection] = Connection, max_size: int = 10,
+                 min_idle: int = 0, acquire_timeout: Optional[float] = None,
+                 max_idle_time: Optional[float] = None, max_lifetime: Optional[float] = None,
+                 validate: bool = True, evict_interval: Optional[float] = None,
+                 budget: Optional[ConnectionBudget] = None):
+        """
+        :param max_size: Hard cap of the open connections, including the ones in use
+        :param min_idle: Number of idle connections kept open by `evict`
+        :param acquire_timeout: Default seconds to wait for a connection. None to wait forever.
+        :param max_idle_time: Seconds after which an idle connection is closed
+        :param max_lifetime: Seconds after which a connection is closed instead of being reused
+        :param validate: Check `Connection.is_valid` before lending a connection
+        :param evict_interval: Seconds between background `evict` runs. None for no background eviction.
+        :param budget: Cap of the open connections shared with other pools
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.min_idle = min(min_idle, max_size)
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.validate = validate
+        self.budget = budget
+
+        self._condition = threading.Condition()
+        self._idle = deque()  # Most recently used on the right
+        self._total = 0  # Open connections, including the ones in use and being opened
+        self._in_use = 0
+        self._stats = dict.fromkeys(('created', 'evicted', 'invalid', 'acquired', 'timeouts'), 0)
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._closed = False
+        self._entered = threading.local()  # Connections borrowed by `with pool as conn:`, per thread
+
+        self._evictor = None
+        if evict_interval is not None:
+            self._evictor = threading.Thread(target=self._evict_forever, args=(evict_interval,), daemon=True)
+            self._evictor.start()
+
+    def _expired(self, conn: Connection, now: float) -> bool:
+        return self.max_lifetime is not None and now - conn.created > self.max_lifetime
+
+    def acquire(self, timeout: Optional[float] = None) -> Connection:
+        """ Borrow a connection. Raise `TimeoutError` if none is available within `timeout`. """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        while True:
+            conn, short_of_budget = None, False
+            with self._condition:
+                # Check and take under the same lock, so that no extra connection is opened
+                while self._closed or (not self._idle and self._total >= self.max_size):
+                    if self._closed:
+                        raise RuntimeError('pool is closed')
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise TimeoutError(f'no connection available within {timeout}s')
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self.budget is None or self.budget.try_reserve():
+                    self._total += 1
+                else:
+                    short_of_budget = True
+
+            if short_of_budget:
+                # Ask the other pools for their idle connections, otherwise wait for the budget a while
+                if not self.budget.reclaim(self):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        with self._condition:
+                            self._stats['timeouts'] += 1
+                        raise TimeoutError(f'no connection available within {timeout}s')
+                    # Wake up to check the idle connections of this pool too
+                    self.budget.wait(0.05 if remaining is None else min(remaining, 0.05))
+                continue
+
+            if conn is None:
+                conn = self._open()
+            elif self._expired(conn, time.monotonic()) or (self.validate and not conn.is_valid()):
+                self._discard(conn, 'invalid')
+                continue
+
+            waited = time.monotonic() - start
+            with self._condition:
+                self._in_use += 1
+                self._stats['acquired'] += 1
+                self._wait_time += waited
+                self._max_wait = max(self._max_wait, waited)
+            return conn
+
+    def _open(self) -> Connection:
+        """ Called after reserving a slot in `_total` """
+        try:
+            conn = self.factory()
+        except BaseException:
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            if self.budget is not None:
+                self.budget.release()
+            raise
+
+        with self._condition:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn: Connection, reason: str):
+        conn.close()
+        with self._condition:
+            self._total -= 1
+            self._stats[reason] += 1
+            # A waiter can open a new connection instead
+            self._condition.notify()
+        if self.budget is not None:
+            self.budget.release()
+
+    def release(self, conn: Connection):
+        conn.clear()
+        conn.last_used = time.monotonic()
+        with self._condition:
+            self._in_use -= 1
+            reuse = not self._closed and not self._expired(conn, conn.last_used)
+            if reuse:
+                self._idle.append(conn)
+                self._condition.notify()
+
+        if not reuse:
+            self._discard(conn, 'evicted')
+        elif self.budget is not None:
+            self.budget.released(self)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Connection]:
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def __enter__(self) -> Connection:
+        """ `with pool as conn:`, same as `with pool.connection() as conn:` """
+        conn = self.acquire()
+        self._entered.__dict__.setdefault('stack', []).append(conn)
+        return conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release(self._entered.stack.pop())
+        return False
+
+    def evict_idle(self, n: int = 1) -> int:
+        """ Close up to `n` least recently used idle connections, and return the number closed """
+        with self._condition:
+            evicted = [self._idle.popleft() for _ in range(min(n, len(self._idle)))]
+
+        for conn in evicted:
+            self._discard(conn, 'evicted')
+        return len(evicted)
+
+    def evict(self):
+        """ Close idle connections past `max_idle_time` or `max_lifetime`, then open up to `min_idle` """
+        now = time.monotonic()
+        evicted = []
+        with self._condition:
+            # The least recently used ones are on the left
+            for conn in list(self._idle):
+                if len(self._idle) <= self.min_idle and not self._expired(conn, now):
+                    break
+                idle_too_long = self.max_idle_time is not None and now - conn.last_used > self.max_idle_time
+                if idle_too_long or self._expired(conn, now):
+                    self._idle.remove(conn)
+                    evicted.append(conn)
+
+        for conn in evicted:
+            self._discard(conn, 'evicted')
+
+        while True:
+            with self._condition:
+                if self._closed or len(self._idle) >= self.min_idle or self._total >= self.max_size:
+                    return
+                if self.budget is not None and not self.budget.try_reserve():
+                    return
+                self._total += 1
+            conn = self._open()
+            with self._condition:
+                self._idle.appendleft(conn)
+                self._condition.notify()
+            if self.budget is not None:
+                self.budget.released(self)
+
+    def _evict_forever(self, interval: float):
+        while not self._closed:
+            time.sleep(interval)
+            self.evict()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            acquired = self._stats['acquired']
+            return {
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'total': self._total,
+                **self._stats,
+                'avg_wait': self._wait_time / acquired if acquired else 0.0,
+                'max_wait': self._max_wait,
+            }
+
+    def close(self):
+        """ Close the idle connections. The ones in use are closed when released. """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._condition.notify_all()
+
+        for conn in idle:
+            self._discard(conn, 'evicted')
+
+
+class KeyedConnectionPool:
+    """
+    Multiton of `ConnectionPool`, one per key(ex. DSN), created lazily.
+    All the pools share a global budget of open connections. When it runs out, idle
+    connections of the least recently released key are closed for the key in need.
+    """
+
+    def __init__(self, factory: Callable[[str], Connection], max_total: int = 100, **pool_kwargs):
+        """
+        :param factory: Open a connection for the key
+        :param pool_kwargs: Passed to each `ConnectionPool`, ex. `max_size` per key
+        """
+        self.factory = factory
+        self.pool_kwargs = pool_kwargs
+        self.budget = ConnectionBudget(max_total)
+        # Pools are kept for good, eviction works on their idle connections through `budget`
+        self._pools: Dict[str, ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, key: str) -> ConnectionPool:
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ConnectionPool(lambda: self.factory(key), budget=self.budget,
+                                                         **self.pool_kwargs)
+
+        return pool
+
+    def connection(self, key: str, timeout: Optional[float] = None):
+        return self.pool(key).connection(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pools = list(self._pools.values())
+
+        total = {'keys': len(pools), 'budget_used': self.budget.used}
+        for pool in pools:
+            for key, value in pool.stats().items():
+                if key not in ('avg_wait', 'max_wait'):
+                    total[key] = total.get(key, 0) + value
+        return total
+
+
+class AsyncConnection:
+    """ Fake connection with simulated latency """
+
+    def __init__(self, latency: float = 0.001):
+        self.latency = latency
+        self.closed = False
+
+    @classmethod
+    async def open(cls, latency: float = 0.001) -> 'AsyncConnection':
+        await asyncio.sleep(latency)
+        return cls(latency)
+
+    async def query(self, *args):
+        await asyncio.sleep(self.latency)
+
+    async def ping(self) -> bool:
+        await asyncio.sleep(self.latency)
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
 
-    def __enter__(self):
-        if ConnectionPool.POOL.empty():
-            ConnectionPool.POOL.put(Connection())
 
-        self._connection = ConnectionPool.POOL.get()
-        return self._connection
+class AsyncConnectionPool:
+    """
+    Pool for asyncio, which never blocks the event loop.
+    Waiters are served in FIFO order: a released connection is handed over to the first
+    waiter directly, so that a newcomer can't take it first.
+    """
 
-    def __exit__(self, Type, value, traceback):
-        ConnectionPool.POOL.put(self._connection)
-        self._connection.clear()
-        self._connection = None
+    def __init__(self, factory: Callable[[], Awaitable[AsyncConnection]] = AsyncConnection.open,
+                 max_size: int = 10, health_check_interval: Optional[float] = None):
+        """
+        :param health_check_interval: Seconds between pings of the idle connections. None for no health check.
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._waiters = deque()  # Futures of the waiting coroutines
+        self._total = 0
+        self._health_check: Optional[asyncio.Task] = None
+        self._closing = set()  # Tasks closing the connections released after `close`
+        self._closed = False
+
+    async def acquire(self, timeout: Optional[float] = None) -> AsyncConnection:
+        if self._closed:
+            raise RuntimeError('pool is closed')
+        if self.health_check_interval is not None and self._health_check is None:
+            self._health_check = asyncio.get_running_loop().create_task(self._check_forever())
+
+        if self._idle and not self._waiters:
+            return self._idle.pop()
+
+        if self._total < self.max_size and not self._waiters:
+            self._total += 1
+            return await self._open()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            conn = await asyncio.wait_for(waiter, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if waiter.done() and not waiter.cancelled():
+                # Handed over right before the cancellation, so pass it to the next waiter
+                conn = waiter.result()
+                if conn is None:
+                    self._total -= 1
+                self._hand_over(conn)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+        # None means a free slot to open a new connection
+        return conn if conn is not None else await self._open()
+
+    async def _open(self) -> AsyncConnection:
+        """ Called after reserving a slot in `_total` """
+        try:
+            return await self.factory()
+        except BaseException:
+            self._total -= 1
+            self._hand_over(None)
+            raise
+
+    def _hand_over(self, conn: Optional[AsyncConnection]):
+        """ Give `conn`(or a free slot if None) to the first waiter, otherwise keep it """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                if conn is None:
+                    self._total += 1
+                waiter.set_result(conn)
+                return
+
+        if conn is not None:
+            self._idle.append(conn)
+
+    def release(self, conn: AsyncConnection):
+        if self._closed:
+            self._total -= 1
+            if not conn.closed:
+                task = asyncio.get_running_loop().create_task(conn.close())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        elif conn.closed:
+            self._total -= 1
+            self._hand_over(None)
+        else:
+            self._hand_over(conn)
+
+    @asynccontextmanager
+    async def connection(self, timeout: Optional[float] = None) -> AsyncIterator[AsyncConnection]:
+        conn = await self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def check(self):
+        """ Ping the idle connections, and close the broken ones """
+        idle, self._idle = list(self._idle), deque()
+        try:
+            results = await asyncio.gather(*(conn.ping() for conn in idle), return_exceptions=True)
+        except asyncio.CancelledError:
+            # Put them back unchecked
+            for conn in idle:
+                self.release(conn)
+            raise
+
+        # Settle the accounting before awaiting, so that a cancellation can't lose connections
+        broken = []
+        for conn, ok in zip(idle, results):
+            if ok is True:
+                self.release(conn)
+            else:
+                broken.append(conn)
+                self._total -= 1
+                self._hand_over(None)
+        await asyncio.gather(*(conn.close() for conn in broken), return_exceptions=True)
+
+    async def _check_forever(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check()
+
+    async def close(self):
+        """ Close the idle connections, and fail the waiters. The ones in use are closed when released. """
+        self._closed = True
+        if self._health_check is not None:
+            self._health_check.cancel()
+            # Let an ongoing `check` put back its connections
+            await asyncio.gather(self._health_check, return_exceptions=True)
+
+        waiters, self._waiters = self._waiters, deque()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(RuntimeError('pool is closed'))
+
+        idle, self._idle = list(self._idle), deque()
+        self._total -= len(idle)
+        await asyncio.gather(*(conn.close() for conn in idle), *self._closing, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {'in_use': self._total - len(self._idle), 'idle': len(self._idle),
+                'total': self._total, 'waiting': len(self._waiters)}
+
+
+class BufferPool:
+    """
+    Pool of `bytearray`s in power-of-two size classes, lent as `memoryview` slices without copying.
+    Requests larger than `max_size` get a new buffer which is not pooled.
+    It pays off for large buffers, where zero-filling a new `bytearray` costs more than the pool's bookkeeping.
+    """
+
+    def __init__(self, min_size: int = 256, max_size: int = 1 << 20, max_free: int = 64, debug: bool = False):
+        """
+        :param max_free: Number of free buffers kept per size class
+        :param debug: Check that no view of a buffer is alive when it is returned
+        """
+        self.min_size = 1 << (min_size - 1).bit_length()
+        self.max_size = max_size
+        self.max_free = max_free
+        self.debug = debug
+        # `list.pop` and `list.append` are atomic, so the free lists need no lock
+        self._free: Dict[int, List[bytearray]] = {}
+        capacity = self.min_size
+        while capacity < max_size:
+            self._free[capacity] = []
+            capacity *= 2
+        self._free[capacity] = []
+        self._lock = threading.Lock()  # Only for the stats
+        self._stats = dict.fromkeys(('allocated', 'oversized', 'leaked'), 0)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def acquire(self, size: int) -> memoryview:
+        """ View of `size` bytes, which must be given back with `release` """
+        if size <= 0:
+            raise ValueError(f'size must be positive, not {size}')
+        capacity = 1 << (size - 1).bit_length()
+        if capacity < self.min_size:
+            capacity = self.min_size
+        try:
+            buffer = self._free[capacity].pop()
+        except KeyError:
+            self._count('oversized')
+            buffer = bytearray(size)
+        except IndexError:
+            self._count('allocated')
+            buffer = bytearray(capacity)
+        return memoryview(buffer)[:size]
+
+    def release(self, view: memoryview):
+        """ Give back the view from `acquire`, which must not be used after this """
+        buffer = view.obj
+        view.release()
+        if self.debug:
+            try:
+                # A bytearray can't be resized while a view of it is alive
+                buffer.append(0)
+                del buffer[-1]
+            except BufferError:
+                self._count('leaked')
+                # The buffer is not reused, so the leaked view doesn't see other data
+                raise BufferError(f'a view of a {len(buffer)} bytes buffer is used after release') from None
+
+            # Make reads of stale data obvious
+            buffer[:] = b'\xdd' * len(buffer)
+
+        free = self._free.get(len(buffer))
+        if free is not None and len(free) < self.max_free:
+            free.append(buffer)
+
+    def borrow(self, size: int) -> '_Lease':
+        """ `with pool.borrow(size) as view:` acquires and releases the view around the block """
+        return _Lease(self, size)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'free': sum(len(free) for free in self._free.values())}
+
+
+class _Lease:
+    """ Context manager of `BufferPool.borrow`, lighter than a `contextmanager` generator """
+    __slots__ = ('pool', 'size', 'view')
+
+    def __init__(self, pool: BufferPool, size: int):
+        self.pool = pool
+        self.size = size
+
+    def __enter__(self) -> memoryview:
+        self.view = self.pool.acquire(self.size)
+        return self.view
+
+    def __exit__(self, *exc_info):
+        self.pool.release(self.view)
+
+
+POOL = ConnectionPool(max_size=3, acquire_timeout=10, max_idle_time=30)
 
 
 def main():
-    with ConnectionPool() as conn:
+    with POOL.connection() as conn:
         conn.query()
 
 
-if __name__ == '__main__':
+def benchmark(keys: int = 1_000, threads: int = 8, n: int = 20_000, max_total: int = 200):
+    """ Acquire/release on random keys, more keys than the global budget """
+    registry = KeyedConnectionPool(lambda key: Connection(), max_total=max_total, max_size=4)
+
+    def work(count: int):
+        rng = random.Random()
+        for _ in range(count):
+            with registry.connection(f'dsn-{rng.randrange(keys)}'):
+                pass
+
+    start = time.perf_counter()
+    thrs = [threading.Thread(target=work, args=(n // threads,)) for _ in range(threads)]
+    for thr in thrs:
+        thr.start()
+    for thr in thrs:
+        thr.join()
+    elapsed = time.perf_counter() - start
+
+    print(f'keys={keys} threads={threads} {n / elapsed:10,.0f} acquire/release per second')
+    print(registry.stats())
+
+
+def benchmark_async(coroutines: int = 10_000, max_size: int = 50, latency: float = 0.001):
+    """ `coroutines` concurrent queries against the fake connection """
+    async def query(pool: AsyncConnectionPool) -> float:
+        start = time.perf_counter()
+        async with pool.connection() as conn:
+            await conn.query()
+        return time.perf_counter() - start
+
+    async def run():
+        pool = AsyncConnectionPool(lambda: AsyncConnection.open(latency), max_size=max_size,
+                                   health_check_interval=0.1)
+        start = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(query(pool) for _ in range(coroutines))))
+        elapsed = time.perf_counter() - start
+        await pool.close()
+
+        print(f'coroutines={coroutines} max_size={max_size} {coroutines / elapsed:10,.0f} queries/s '
+              f'p50={latencies[len(latencies) // 2] * 1000:.1f}ms p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms')
+
+    asyncio.run(run())
+
+
+def benchmark_buffers(n: int = 50_000, sizes: tuple = (512, 4096, 65536, 262144), in_flight: int = 32):
+    """ `BufferPool` against a new `bytearray` per read, keeping `in_flight` buffers alive like queued reads """
+    import io
+    data = io.BytesIO(bytes(max(sizes)))
+    pool = BufferPool()
+
+    for size in sizes:
+        for name, acquire, release in (('bytearray', bytearray, None), ('BufferPool', pool.acquire, pool.release)):
+            reads = deque()
+            start = time.perf_counter()
+            for _ in range(n):
+                buffer = acquire(size)
+                data.seek(0)
+                data.readinto(buffer)
+                reads.append(buffer)
+                if len(reads) > in_flight and release is not None:
+                    release(reads.popleft())
+                elif len(reads) > in_flight:
+                    reads.popleft()
+            elapsed = time.perf_counter() - start
+            print(f'size={size:<7} {name:<10} {n / elapsed:12,.0f} reads/s')
+    print(pool.stats())
+
+
+if __name__ == '__main__' and 'bench' in sys.argv[1:]:
+    benchmark()
+    benchmark_async()
+    benchmark_buffers()
+elif __name__ == '__main__':
     thrs = []
     for i in range(10):
         thrs.append(threading.Thread(target=main))
 
     for thr in thrs:
         thr.start()
+
+    for thr in thrs:
+        thr.join()
+
+    print(POOL.stats())